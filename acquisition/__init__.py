@@ -0,0 +1,3 @@
+from .acquisition import Acquisition
+from .ring_buffer import RingBuffer
+from .sources import BciSource, FileReplaySource
\ No newline at end of file
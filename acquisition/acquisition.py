@@ -0,0 +1,64 @@
+import threading
+
+import numpy as np
+
+from acquisition.ring_buffer import RingBuffer
+from acquisition.sources import BciSource
+from bci_data import BciLog
+
+
+class Acquisition:
+    """
+    Приём записей BCI в реальном времени: фоновый поток читает пачки из источника и
+    складывает их в кольцевой буфер на history_seconds секунд, откуда по временной метке
+    стимула можно получить окно без копирования.
+    """
+
+    def __init__(self, source: BciSource, sampling_rate: int, history_seconds: float = 30,
+                 dtype: type = np.float64) -> None:
+        self.source: BciSource = source
+        self.channels: list[str] = source.get_channels()
+        self.buffer: RingBuffer = RingBuffer(
+            capacity=int(sampling_rate * history_seconds),
+            n_channels=len(self.channels),
+            dtype=dtype
+        )
+        self.stopped: threading.Event = threading.Event()
+        self.finished: threading.Event = threading.Event()  # источник закончил отдавать данные
+        self.thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self.stopped.clear()
+        self.finished.clear()
+        self.source.start()
+        self.thread = threading.Thread(target=self._acquire, name='Acquisition', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.source.stop()
+
+    def _acquire(self) -> None:
+        while not self.stopped.is_set():
+            chunk: BciLog | None = self.source.read()
+            if chunk is None:
+                break
+            if len(chunk):
+                self.buffer.write(timestamps=chunk.timestamps, values=chunk.values)
+        self.finished.set()
+
+    def get_epoch(self, timestamp: int, shift_us: int, length: int) -> np.ndarray | None:
+        """
+        Окно (length, n_channels) для стимула с временной меткой timestamp (мкс, time.time()),
+        представление в кольцевом буфере. None - если окно ещё не записано целиком.
+        """
+        return self.buffer.get_epoch(timestamp=timestamp, shift_us=shift_us, length=length)
+
+    def latest_timestamp(self) -> int | None:
+        written: int = self.buffer.written
+        if not written:
+            return None
+        return int(self.buffer.timestamps[(written - 1) % self.buffer.capacity])
@@ -0,0 +1,121 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Кольцевой буфер последних capacity записей BCI.
+
+    Каждая запись хранится дважды - в позиции i % capacity и i % capacity + capacity, поэтому
+    любое окно длиной до capacity лежит в памяти непрерывно и отдаётся как представление
+    без копирования. Рассчитан на одного писателя и одного читателя без блокировок: писатель
+    сначала записывает данные, а затем увеличивает счётчик written, и читатель видит только
+    записи с номерами меньше written.
+
+    Писатель записывает данные порциями не больше guard записей, затирая самые старые записи.
+    Пока читатель ищет по снимку written = W, писатель может опубликовать ещё до guard записей
+    и начать следующую порцию, которая затрёт записи до W + 2 * guard - capacity, поэтому читателю
+    доступны только последние capacity - 2 * guard записей снимка, а поиск повторяется, если
+    писатель успел продвинуться больше чем на guard записей.
+
+    Представление, полученное из window() / get_epoch(), остаётся верным, пока писатель не
+    перезапишет эти записи, то есть пока окно входит в последние capacity - 2 * guard записей.
+    Если окно нужно хранить дольше, его следует скопировать.
+    """
+
+    def __init__(self, capacity: int, n_channels: int, dtype: type = np.float64, guard: int | None = None) -> None:
+        self.capacity: int = capacity
+        self.guard: int = guard if guard is not None else max(1, capacity // 16)
+        self.timestamps: np.ndarray = np.zeros(2 * capacity, dtype=np.int64)
+        self.values: np.ndarray = np.zeros((2 * capacity, n_channels), dtype=dtype)
+        self.written: int = 0  # сколько записей записано за всё время
+
+    def __len__(self) -> int:
+        return self.written - self.oldest()
+
+    def write(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        for start in range(0, len(timestamps), self.guard):
+            self._write_chunk(timestamps[start:start + self.guard], values[start:start + self.guard])
+
+    def _write_chunk(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        positions: np.ndarray = (self.written + np.arange(len(timestamps))) % self.capacity
+        self.timestamps[positions] = timestamps
+        self.timestamps[positions + self.capacity] = timestamps
+        self.values[positions] = values
+        self.values[positions + self.capacity] = values
+        # Публикуем записи только после того, как они записаны
+        self.written += len(timestamps)
+
+    def oldest(self, written: int | None = None) -> int:
+        """Номер самой старой записи, доступной читателю (written - снимок счётчика, по умолчанию текущий)"""
+        written = self.written if written is None else written
+        return max(0, written - self.capacity + 2 * self.guard)
+
+    def _is_stable(self, written: int) -> bool:
+        """Записи, доступные по снимку written, не затёрты, пока читатель с ними работал"""
+        return self.written - written <= self.guard
+
+    def window(self, start: int, length: int, written: int | None = None) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        Временные метки и значения записей с номерами [start, start + length) без копирования.
+        None - если часть окна ещё не записана.
+        """
+        written = self.written if written is None else written
+        if length > self.capacity - 2 * self.guard:
+            raise ValueError(
+                'The window is longer than the ring buffer'
+            )
+        if start < self.oldest(written):
+            raise ValueError(
+                'The window has already been overwritten in the ring buffer'
+            )
+        if start + length > written:
+            return None
+        position: int = start % self.capacity
+        return self.timestamps[position:position + length], self.values[position:position + length]
+
+    def _search(self, timestamp: int, written: int) -> int:
+        oldest: int = self.oldest(written)
+        position: int = oldest % self.capacity
+        timestamps: np.ndarray = self.timestamps[position:position + written - oldest]
+        return oldest + int(np.searchsorted(timestamps, timestamp))
+
+    def find(self, timestamp: int) -> int:
+        """Номер первой записи с временной меткой не меньше timestamp (written, если такой записи ещё нет)"""
+        while True:
+            written: int = self.written
+            found: int = self._search(timestamp, written)
+            if self._is_stable(written):
+                return found
+
+    def get_epoch(self, timestamp: int, shift_us: int, length: int) -> np.ndarray | None:
+        """
+        Окно из length записей, начинающееся через shift_us мкс после первой записи,
+        сделанной не раньше timestamp (как в LogMerger). None - если окно ещё не записано целиком.
+        Все шаги выполняются по одному снимку written и повторяются, если писатель затёр его записи.
+        """
+        while True:
+            written: int = self.written
+            try:
+                epoch: np.ndarray | None = self._get_epoch(timestamp, shift_us, length, written)
+            except ValueError:
+                if self._is_stable(written):
+                    raise
+                continue
+            if self._is_stable(written):
+                return epoch
+
+    def _get_epoch(self, timestamp: int, shift_us: int, length: int, written: int) -> np.ndarray | None:
+        start_position: int = self._search(timestamp, written)
+        if start_position >= written:
+            return None
+        start_timestamp: int = int(self.timestamps[start_position % self.capacity])
+        if start_position > 0 and start_position == self.oldest(written) and start_timestamp > timestamp:
+            raise ValueError(
+                'The stimulus is older than the history kept in the ring buffer'
+            )
+        shifted_position: int = self._search(start_timestamp + shift_us, written)
+        if shifted_position >= written:
+            return None
+        window: tuple[np.ndarray, np.ndarray] | None = self.window(start=shifted_position, length=length,
+                                                                   written=written)
+        return None if window is None else window[1]
@@ -0,0 +1,81 @@
+import abc
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from bci_data import BciLog
+
+if TYPE_CHECKING:
+    from log_merger.bci_log_builder import BciLogBuilder
+
+
+class BciSource(abc.ABC):
+    """
+    Источник записей BCI для Acquisition.
+    Источник, получающий данные по одной записи (NeiryBatch / EmotivBatch в BciRecord),
+    может собирать их в пачку через BciLog.from_records().
+    """
+
+    @abc.abstractmethod
+    def get_channels(self) -> list[str]:
+        ...
+
+    def start(self) -> None:
+        ...
+
+    @abc.abstractmethod
+    def read(self) -> BciLog | None:
+        """Очередная пачка записей (может быть пустой); None - данные закончились"""
+        ...
+
+    def stop(self) -> None:
+        ...
+
+
+class FileReplaySource(BciSource):
+    """
+    Воспроизводит записанный лог BCI, прочитанный через BciLogBuilder, пачками по chunk_size записей.
+    realtime=True - пачка отдаётся не раньше, чем её последняя запись была бы получена от устройства
+    (с ускорением speed); restamp=True - временные метки сдвигаются так, чтобы первая запись
+    пришлась на момент start() по time.time().
+    """
+
+    def __init__(self, bci_file: str, bci_log_builder: 'BciLogBuilder', chunk_size: int = 16,
+                 realtime: bool = True, speed: float = 1.0, restamp: bool = True, dtype: type = np.float64) -> None:
+        self.bci_log: BciLog = bci_log_builder.read_log(bci_file=bci_file, dtype=dtype)
+        self.chunk_size: int = chunk_size
+        self.realtime: bool = realtime
+        self.speed: float = speed
+        self.restamp: bool = restamp
+        self.position: int = 0
+        self.started: float = 0.0
+        self.timestamps: np.ndarray = self.bci_log.timestamps
+
+    def get_channels(self) -> list[str]:
+        return self.bci_log.channels
+
+    def start(self) -> None:
+        self.position = 0
+        self.started = time.time()
+        self.timestamps = self.bci_log.timestamps
+        if self.restamp and len(self.bci_log):
+            self.timestamps = self.timestamps - self.timestamps[0] + int(self.started * 1_000_000)
+
+    def read(self) -> BciLog | None:
+        if self.position >= len(self.bci_log):
+            return None
+        end: int = min(self.position + self.chunk_size, len(self.bci_log))
+        if self.realtime:
+            # Через сколько секунд от начала воспроизведения устройство отдало бы последнюю запись пачки
+            due: float = (self.bci_log.timestamps[end - 1] - self.bci_log.timestamps[0]) / 1_000_000 / self.speed
+            delay: float = self.started + due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        chunk: BciLog = BciLog(
+            timestamps=self.timestamps[self.position:end],
+            values=self.bci_log.values[self.position:end],
+            channels=self.bci_log.channels
+        )
+        self.position = end
+        return chunk
@@ -1 +1,2 @@
-from .bci_data import BciRecord, BciSignalBatch, EmotivBatch, NeiryBatch
\ No newline at end of file
+from .bci_data import BciLog, BciRecord, BciSignalBatch, EmotivBatch, NeiryBatch
+from .devices import DEVICES, EMOTIV, NEIRY, DeviceSpec, device_by_headers, get_device, register_device, sniff_device
\ No newline at end of file
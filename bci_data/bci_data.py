@@ -1,56 +1,120 @@
-import abc
 from dataclasses import dataclass
 
+import numpy as np
 
-class BciSignalBatch(abc.ABC):
-    @abc.abstractmethod
-    def get_headers(self) -> list[str]:
-        ...
 
-    @abc.abstractmethod
-    def get_values(self) -> list[float]:
-        ...
+class BciSignalBatch:
+    """
+    Значения всех каналов одной записи. Раскладка каналов объявляется один раз на устройство
+    (CHANNELS подкласса), значения хранятся в одном массиве values (n_channels,) без __dict__
+    на экземпляр; каналы доступны и как атрибуты (batch.o1).
+    """
+    __slots__ = ('values',)
+    CHANNELS: tuple[str, ...] = ()
 
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        for index, channel in enumerate(cls.CHANNELS):
+            setattr(cls, channel, property(
+                lambda self, index=index: float(self.values[index]),
+                lambda self, value, index=index: self.values.__setitem__(index, value)
+            ))
 
-@dataclass
-class NeiryBatch(BciSignalBatch):
-    o1: float
-    t3: float
-    t4: float
-    o2: float
+    def __init__(self, *values: float, **channels: float) -> None:
+        names: tuple[str, ...] = self.CHANNELS[len(values):]
+        if len(values) > len(self.CHANNELS) or channels.keys() != set(names):
+            raise TypeError(
+                f'{type(self).__name__} expects the values of the channels {", ".join(self.CHANNELS)}'
+            )
+        self.values: np.ndarray = np.array(values + tuple(channels[name] for name in names), dtype=np.float64)
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> 'BciSignalBatch':
+        """Запись поверх массива (n_channels,) без копирования"""
+        values = np.asarray(values)
+        if values.shape != (len(cls.CHANNELS),):
+            raise ValueError(
+                f'{cls.__name__} expects {len(cls.CHANNELS)} channels, got an array of shape {values.shape}'
+            )
+        batch: BciSignalBatch = cls.__new__(cls)
+        batch.values = values
+        return batch
+
+    @classmethod
+    def from_array(cls, values: np.ndarray) -> list['BciSignalBatch']:
+        """Записи по строкам массива (n_samples, n_channels) - представления строк без копирования"""
+        values = np.asarray(values)
+        if values.ndim != 2 or values.shape[1] != len(cls.CHANNELS):
+            raise ValueError(
+                f'{cls.__name__} expects an array of shape (n_samples, {len(cls.CHANNELS)}), got {values.shape}'
+            )
+        batches: list[BciSignalBatch] = [cls.__new__(cls) for _ in range(len(values))]
+        for batch, row in zip(batches, values):
+            batch.values = row
+        return batches
 
     def get_headers(self) -> list[str]:
-        return ['o1','t3','t4','o2']
+        return list(self.CHANNELS)
 
     def get_values(self) -> list[float]:
-        return [self.o1, self.t3, self.t4, self.o2]
+        return self.values.tolist()
 
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return bool(np.array_equal(self.values, other.values))
 
-@dataclass
-class EmotivBatch(BciSignalBatch):
-    f3: float
-    fc5: float
-    af3: float
-    f7: float
-    t7: float
-    p7: float
-    o1: float
-    o2: float
-    p8: float
-    t8: float
-    f8: float
-    af4: float
-    fc6: float
-    f4: float
-
-    def get_headers(self) ->list[str]:
-        return ['f3','fc5','af3','f7','t7','p7','o1','o2','p8','t8','f8','af4','fc6','f4']
+    __hash__ = None
 
-    def get_values(self) -> list[float]:
-        return [self.f3, self.fc5, self.af3, self.f7, self.t7, self.p7, self.o1, self.o2, self.p8, self.t8, self.f8, self.af4, self.fc6, self.f4]
+    def __repr__(self) -> str:
+        channels: str = ', '.join(f'{name}={value!r}' for name, value in zip(self.CHANNELS, self.get_values()))
+        return f'{type(self).__name__}({channels})'
 
 
-@dataclass
+class NeiryBatch(BciSignalBatch):
+    __slots__ = ()
+    CHANNELS = ('o1', 't3', 't4', 'o2')
+
+
+class EmotivBatch(BciSignalBatch):
+    __slots__ = ()
+    CHANNELS = ('f3', 'fc5', 'af3', 'f7', 't7', 'p7', 'o1', 'o2', 'p8', 't8', 'f8', 'af4', 'fc6', 'f4')
+
+
+@dataclass(slots=True)
 class BciRecord:
     timestamp: int
-    data: BciSignalBatch
\ No newline at end of file
+    data: BciSignalBatch
+
+
+@dataclass
+class BciLog:
+    """Колоночное представление лога BCI: одна запись - одна строка матрицы values"""
+    timestamps: np.ndarray  # int64, (n_samples,)
+    values: np.ndarray  # float32 / float64, (n_samples, n_channels)
+    channels: list[str]
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @staticmethod
+    def from_records(records: list[BciRecord], dtype: type = np.float64) -> 'BciLog':
+        channels: list[str] = records[0].data.get_headers() if records else []
+        return BciLog(
+            timestamps=np.fromiter((record.timestamp for record in records), dtype=np.int64, count=len(records)),
+            values=np.array(
+                [record.data.values for record in records], dtype=dtype
+            ).reshape(len(records), len(channels)),
+            channels=channels
+        )
+
+    def to_records(self, batch_type: type[BciSignalBatch]) -> list[BciRecord]:
+        """Записи поверх строк values, без копирования значений"""
+        if list(batch_type.CHANNELS) != self.channels:
+            raise ValueError(
+                f'The channels of the log ({", ".join(self.channels)}) do not match {batch_type.__name__}'
+            )
+        return [
+            BciRecord(timestamp=timestamp, data=batch)
+            for timestamp, batch in zip(self.timestamps.tolist(), batch_type.from_array(self.values))
+        ]
@@ -0,0 +1,114 @@
+"""
+Реестр устройств BCI: каналы, другие допустимые имена каналов в заголовке лога и номинальная частота.
+Заголовки всех зарегистрированных устройств собираются в одну таблицу, поэтому устройство лога
+определяется по первой строке файла одним поиском в словаре (sniff_device()).
+
+Новое устройство добавляется одним вызовом:
+    register_device(DeviceSpec(name='unicorn', channels=('fz', 'c3', 'cz', 'c4', 'pz', 'po7', 'oz', 'po8'),
+                               sampling_rate=250.0, numbered_aliases=True))
+"""
+
+import csv
+from dataclasses import dataclass, field
+
+from .bci_data import BciSignalBatch, EmotivBatch, NeiryBatch
+
+
+@dataclass
+class DeviceSpec:
+    name: str
+    channels: tuple[str, ...]
+    sampling_rate: float  # Гц, номинальная частота устройства
+    aliases: tuple[tuple[str, ...], ...] = ()  # другие имена каналов в заголовке лога (в том же порядке)
+    numbered_aliases: bool = False  # заголовок может называть каналы CHANNEL_0 ... CHANNEL_{n-1}
+    # тип записи; None - создаётся по channels
+    batch_type: type[BciSignalBatch] | None = None
+    headers: frozenset[tuple[str, ...]] = field(init=False, repr=False)  # допустимые заголовки в верхнем регистре
+
+    def __post_init__(self) -> None:
+        self.channels = tuple(self.channels)
+        if self.batch_type is None:
+            self.batch_type = type(f'{self.name.capitalize()}Batch', (BciSignalBatch,),
+                                   {'__slots__': (), 'CHANNELS': self.channels})
+        elif self.batch_type.CHANNELS != self.channels:
+            raise ValueError(
+                f'The channels of {self.batch_type.__name__} do not match the channels of the device "{self.name}"'
+            )
+        variants: list[tuple[str, ...]] = [self.channels, *self.aliases]
+        if self.numbered_aliases:
+            variants.append(tuple(f'CHANNEL_{i}' for i in range(len(self.channels))))
+        for variant in variants:
+            if len(variant) != len(self.channels):
+                raise ValueError(
+                    f'The aliases of the device "{self.name}" must name all {len(self.channels)} channels'
+                )
+        self.headers = frozenset(tuple(name.upper() for name in variant) for variant in variants)
+
+    def header_key(self, headers: list[str]) -> tuple[str, ...] | None:
+        """Имена каналов заголовка лога в виде ключа таблицы заголовков, None - нет временных меток"""
+        if headers[:1] != ['timestamp']:
+            return None
+        return tuple(name.upper() for name in headers[1:len(self.channels) + 1])
+
+    def matches(self, headers: list[str]) -> bool:
+        return self.header_key(headers) in self.headers
+
+
+DEVICES: dict[str, DeviceSpec] = {}
+_HEADER_LOOKUP: dict[tuple[str, ...], DeviceSpec] = {}
+# Число каналов в заголовках по убыванию: если начало заголовка подходит нескольким устройствам,
+# выбирается устройство с большим числом каналов
+_CHANNEL_COUNTS: list[int] = []
+
+
+def register_device(device: DeviceSpec) -> DeviceSpec:
+    if device.name in DEVICES:
+        raise ValueError(
+            f'The device "{device.name}" is already registered'
+        )
+    for header in device.headers:
+        if header in _HEADER_LOOKUP:
+            raise ValueError(
+                f'The header {", ".join(header)} of the device "{device.name}" '
+                f'is already used by the device "{_HEADER_LOOKUP[header].name}"'
+            )
+    DEVICES[device.name] = device
+    _HEADER_LOOKUP.update(dict.fromkeys(device.headers, device))
+    _CHANNEL_COUNTS[:] = sorted({len(header) for header in _HEADER_LOOKUP}, reverse=True)
+    return device
+
+
+def get_device(name: str) -> DeviceSpec:
+    if name not in DEVICES:
+        raise ValueError(
+            f'Unknown device "{name}", expected one of: {", ".join(DEVICES)}'
+        )
+    return DEVICES[name]
+
+
+def device_by_headers(headers: list[str]) -> DeviceSpec | None:
+    if headers[:1] != ['timestamp']:
+        return None
+    for count in _CHANNEL_COUNTS:
+        device: DeviceSpec | None = _HEADER_LOOKUP.get(tuple(name.upper() for name in headers[1:count + 1]))
+        if device is not None:
+            return device
+    return None
+
+
+def sniff_device(bci_file: str) -> DeviceSpec:
+    """Устройство, записавшее лог, по первой строке файла"""
+    with open(bci_file, newline='') as bci_log:
+        headers: list[str] = next(csv.reader([bci_log.readline()]), [])
+    device: DeviceSpec | None = device_by_headers(headers)
+    if device is None:
+        raise ValueError(
+            f'The headers of the BCI log {bci_file} do not match any registered device: {", ".join(DEVICES)}'
+        )
+    return device
+
+
+NEIRY: DeviceSpec = register_device(DeviceSpec(name='neiry', channels=NeiryBatch.CHANNELS, sampling_rate=250.0,
+                                               numbered_aliases=True, batch_type=NeiryBatch))
+EMOTIV: DeviceSpec = register_device(DeviceSpec(name='emotiv', channels=EmotivBatch.CHANNELS, sampling_rate=128.0,
+                                                batch_type=EmotivBatch))
@@ -0,0 +1,212 @@
+"""
+Замеры LogMerger на синтетических сессиях (см. synthetic_sessions.py), запуск из корня репозитория:
+
+    python -m benchmarks.bench_log_merger --letters 5 20 80 --repeats 3
+    python -m benchmarks.bench_log_merger --compare benchmark-1a2b3c4.json
+
+Для каждого устройства и размера сессии (число букв) замеряются _read_bci_log(), _read_speller_records(),
+_combine_session_logs() и merge_logs(). Каждый замер выполняется в отдельном процессе, чтобы пиковый
+RSS (resource.getrusage) относился только к нему. В результат попадают лучшее и все времена повторов,
+пропускная способность (записей BCI и подсветок в секунду), пиковый RSS и размер выходного файла.
+
+Результаты пишутся в json вместе с коммитом, версиями и параметрами запуска; --compare сравнивает
+их с результатами другого коммита.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable
+
+import numpy as np
+
+from benchmarks.synthetic_sessions import SyntheticSession, generate_sessions
+from log_merger.bci_log_builder import BciLogBuilder
+from log_merger.log_merger import LogMerger
+
+
+BENCHMARKS: tuple[str, ...] = ('read_bci_log', 'read_speller_records', 'combine_session_logs', 'merge_logs')
+REPOSITORY: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHIFT: int = 200  # мс
+DURATION: int = 300  # мс
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss в Linux - в килобайтах, в macOS - в байтах
+    peak_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / 1024 ** 2 if sys.platform == 'darwin' else peak_rss / 1024
+
+
+def _directory_size(directory: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+def run_case(case: dict) -> dict:
+    """Выполняется в дочернем процессе: повторы одного замера"""
+    baseline_rss: float = _peak_rss_mb()
+    log_merger: LogMerger = LogMerger(bci_log_builder=BciLogBuilder(device=case['device']))
+    log_files: list[tuple[str, str]] = [tuple(log_pair) for log_pair in case['log_files']]
+    bci_file, speller_file = log_files[0]
+    output_bytes: int | None = None
+
+    def merge() -> None:
+        nonlocal output_bytes
+        with tempfile.TemporaryDirectory() as output_dir:
+            log_merger.merge_logs(log_files=log_files, output_file=os.path.join(output_dir, 'merged.' + case['format']),
+                                  shift=SHIFT, duration=DURATION, desc='benchmark',
+                                  output_format=case['format'])
+            output_bytes = _directory_size(output_dir)
+
+    runs: dict[str, Callable[[], object]] = {
+        'read_bci_log': lambda: log_merger._read_bci_log(bci_file=bci_file),
+        'read_speller_records': lambda: LogMerger._read_speller_records(speller_file=speller_file),
+        'combine_session_logs': lambda: log_merger._combine_session_logs(
+            bci_file=bci_file, speller_file=speller_file, shift=SHIFT, duration=DURATION
+        ),
+        'merge_logs': merge,
+    }
+    seconds: list[float] = []
+    for _ in range(case['repeats']):
+        started: float = time.perf_counter()
+        runs[case['benchmark']]()
+        seconds.append(time.perf_counter() - started)
+    best: float = min(seconds)
+    return {
+        **{key: value for key, value in case.items() if key != 'log_files'},
+        'seconds': best,
+        'repeat_seconds': seconds,
+        'samples_per_second': case['samples'] / best if case['samples'] else None,
+        'events_per_second': case['events'] / best if case['events'] else None,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'baseline_rss_mb': round(baseline_rss, 1),
+        'output_bytes': output_bytes,
+    }
+
+
+def _run_in_subprocess(case: dict) -> dict:
+    completed: subprocess.CompletedProcess = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_log_merger', '--run-case', json.dumps(case)],
+        cwd=REPOSITORY, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(
+            f'The benchmark {case["benchmark"]} ({case["device"]}, {case["letters"]} letters) failed:\n'
+            f'{completed.stderr}'
+        )
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPOSITORY, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(data_dir: str, devices: list[str], letters: list[int], sessions: int = 2, repeats: int = 3,
+                   output_format: str = 'npy', seed: int = 0, benchmarks: tuple[str, ...] = BENCHMARKS) -> dict:
+    results: list[dict] = []
+    for device in devices:
+        for letter_count in letters:
+            generated: list[SyntheticSession] = generate_sessions(directory=data_dir, device=device,
+                                                                  letters=letter_count, sessions=sessions, seed=seed)
+            for benchmark in benchmarks:
+                # merge_logs() объединяет все сессии, остальные замеры - первую
+                measured: list[SyntheticSession] = generated if benchmark == 'merge_logs' else generated[:1]
+                result: dict = _run_in_subprocess({
+                    'benchmark': benchmark,
+                    'device': device,
+                    'letters': letter_count,
+                    'sessions': len(measured),
+                    'samples': sum(session.samples for session in measured)
+                    if benchmark != 'read_speller_records' else 0,
+                    'events': sum(session.events for session in measured) if benchmark != 'read_bci_log' else 0,
+                    'format': output_format,
+                    'repeats': repeats,
+                    'log_files': [(session.bci_file, session.speller_file) for session in measured],
+                })
+                print(_format_result(result), flush=True)
+                results.append(result)
+    return {
+        'commit': _commit(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'parameters': {'shift': SHIFT, 'duration': DURATION, 'sessions': sessions, 'repeats': repeats,
+                       'format': output_format, 'seed': seed},
+        'results': results,
+    }
+
+
+def _format_result(result: dict) -> str:
+    throughput: str = (
+        f'{result["samples_per_second"]:,.0f} samples/s' if result['samples_per_second'] is not None
+        else f'{result["events_per_second"]:,.0f} events/s'
+    )
+    output: str = f', output {result["output_bytes"] / 1024 ** 2:.1f} MB' if result['output_bytes'] is not None else ''
+    return (
+        f'{result["benchmark"]:<22} {result["device"]:<7} {result["letters"]:>4} letters: '
+        f'{result["seconds"] * 1000:9.1f} ms, {throughput}, peak RSS {result["peak_rss_mb"]:.0f} MB{output}'
+    )
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.1) -> list[str]:
+    """Строки сравнения времён; '!' - замедление больше чем на threshold"""
+    baseline_seconds: dict[tuple, float] = {
+        (result['benchmark'], result['device'], result['letters']): result['seconds'] for result in baseline['results']
+    }
+    lines: list[str] = [f'{baseline.get("commit")} -> {current.get("commit")}']
+    for result in current['results']:
+        key: tuple = (result['benchmark'], result['device'], result['letters'])
+        if key not in baseline_seconds:
+            continue
+        ratio: float = result['seconds'] / baseline_seconds[key]
+        lines.append(
+            f'{"!" if ratio > 1 + threshold else " "} {key[0]:<22} {key[1]:<7} {key[2]:>4} letters: '
+            f'{baseline_seconds[key] * 1000:9.1f} -> {result["seconds"] * 1000:9.1f} ms ({ratio:.2f}x)'
+        )
+    return lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_log_merger', description='Замеры LogMerger')
+    parser.add_argument('--devices', nargs='+', default=['emotiv', 'neiry'])
+    parser.add_argument('--letters', nargs='+', type=int, default=[5, 20, 80],
+                        help='размеры сессий в буквах (около 14 с записи на букву)')
+    parser.add_argument('--sessions', type=int, default=2, help='сессий в замере merge_logs()')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--format', default='npy', help='формат выходного файла merge_logs()')
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'speller_benchmark_data'),
+                        help='каталог синтетических сессий')
+    parser.add_argument('-o', '--output', default=None,
+                        help='json с результатами (по умолчанию benchmark-<коммит>.json)')
+    parser.add_argument('--compare', default=None, help='json с результатами другого коммита для сравнения')
+    parser.add_argument('--run-case', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case is not None:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        sys.exit(0)
+
+    report: dict = run_benchmarks(data_dir=args.data_dir, devices=args.devices, letters=args.letters,
+                                  sessions=args.sessions, repeats=args.repeats, output_format=args.format,
+                                  seed=args.seed, benchmarks=tuple(args.benchmarks))
+    output_file: str = args.output if args.output is not None else f'benchmark-{report["commit"] or "local"}.json'
+    with open(output_file, 'w') as fp:
+        json.dump(report, fp, indent=4)
+    print(f'Results: {output_file}')
+    if args.compare is not None:
+        with open(args.compare) as fp:
+            print('\n'.join(compare_results(baseline=json.load(fp), current=report)))
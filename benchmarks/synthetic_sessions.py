@@ -0,0 +1,150 @@
+"""
+Детерминированный генератор синтетических сессий: лог BCI и лог спеллера в тех же форматах,
+что пишут устройство (после correct_logs.py) и EventLogger.
+
+Подсветки повторяют расписание HighlightManager: за букву max_cycles циклов по всем строкам
+и столбцам в случайном порядке с шагом interval_highlight + interval мс, одна подсветка
+следующего перемешанного цикла, после неё пауза interval_between_symbols мс до следующей буквы.
+Моменты подсветок дрожат на задержку планировщика Tk. Каналы и частота записей берутся из реестра
+устройств (bci_data/devices.py); сигнал - шум с откликом на целевые подсветки через 300 мс.
+
+Одинаковые параметры и seed дают побайтно одинаковые файлы.
+
+    python -m benchmarks.synthetic_sessions --device neiry --letters 20 --sessions 2 -o bench_data
+"""
+
+import argparse
+from dataclasses import dataclass
+import os
+
+import numpy as np
+
+from bci_data import DeviceSpec, get_device
+
+
+GENERATOR_VERSION: int = 1  # меняется вместе с содержимым генерируемых файлов
+START_TIMESTAMP: int = 1_731_160_000_000_000  # мкс
+SIGNAL_OFFSETS: dict[str, float] = {'emotiv': 4200.0}  # постоянная составляющая сигнала устройства, мкВ
+
+
+@dataclass
+class SpellerTiming:
+    """Параметры HighlightManager, с которыми записаны сессии (speller v3)"""
+    interval: int = 200  # мс
+    interval_highlight: int = 100  # мс
+    interval_between_symbols: int = 5000  # мс
+    max_cycles: int = 3
+    n_rows: int = 5
+    n_cols: int = 5
+    jitter: float = 2.0  # мс, средняя задержка срабатывания root.after
+
+
+@dataclass
+class SyntheticSession:
+    bci_file: str
+    speller_file: str
+    samples: int
+    events: int
+
+
+def speller_events(letters: int, timing: SpellerTiming, rng: np.random.Generator, start: int) \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Временные метки (мкс), строки и столбцы (-1 - не подсвечивались) и признак цели для всех подсветок"""
+    flashes_per_cycle: int = timing.n_rows + timing.n_cols
+    # Строка или столбец для каждого шага: номера 0..n_rows-1 - строки, дальше - столбцы
+    paths: list[np.ndarray] = []
+    for _ in range(letters):
+        cycles: np.ndarray = np.argsort(rng.random((timing.max_cycles + 1, flashes_per_cycle)), axis=1)
+        paths.append(cycles.ravel()[:timing.max_cycles * flashes_per_cycle + 1])
+    flashes_per_letter: int = len(paths[0]) if paths else 0
+    steps: np.ndarray = np.concatenate(paths) if paths else np.zeros(0, dtype=np.int64)
+
+    step: int = (timing.interval_highlight + timing.interval) * 1000
+    letter_period: int = (flashes_per_letter - 1) * step + timing.interval_between_symbols * 1000
+    nominal: np.ndarray = (
+        start + np.repeat(np.arange(letters) * letter_period, flashes_per_letter)
+        + np.tile(np.arange(flashes_per_letter) * step, letters)
+    )
+    timestamps: np.ndarray = nominal + np.round(rng.exponential(timing.jitter * 1000, len(nominal))).astype(np.int64)
+
+    targets: np.ndarray = rng.integers(0, timing.n_rows * timing.n_cols, letters)
+    target_rows: np.ndarray = np.repeat(targets // timing.n_cols, flashes_per_letter)
+    target_cols: np.ndarray = np.repeat(targets % timing.n_cols, flashes_per_letter)
+    is_row: np.ndarray = steps < timing.n_rows
+    rows: np.ndarray = np.where(is_row, steps, -1)
+    cols: np.ndarray = np.where(is_row, -1, steps - timing.n_rows)
+    is_correct: np.ndarray = np.where(is_row, rows == target_rows, cols == target_cols)
+    return timestamps, rows, cols, is_correct
+
+
+def bci_signal(device: DeviceSpec, start: int, end: int, flashes: np.ndarray, is_correct: np.ndarray,
+               rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Записи устройства с start по end (мкс): временные метки и значения (n_samples, n_channels)"""
+    n_samples: int = int((end - start) * device.sampling_rate / 1_000_000)
+    timestamps: np.ndarray = start + np.round(
+        np.arange(n_samples) * (1_000_000 / device.sampling_rate)
+    ).astype(np.int64)
+    values: np.ndarray = SIGNAL_OFFSETS.get(device.name, 0.0) + rng.normal(0.0, 20.0, (n_samples, len(device.channels)))
+
+    # Отклик на цель: гауссов пик 8 мкВ через 300 мс после подсветки
+    response_times: np.ndarray = np.arange(0, 0.6, 1 / device.sampling_rate)
+    response: np.ndarray = 8.0 * np.exp(-((response_times - 0.3) / 0.05) ** 2 / 2)
+    for position in np.searchsorted(timestamps, flashes[is_correct]):
+        end_position: int = min(int(position) + len(response), n_samples)
+        values[position:end_position] += response[:end_position - position, np.newaxis]
+    return timestamps, values
+
+
+def write_session(directory: str, name: str, device: str = 'emotiv', letters: int = 20, seed: int = 0,
+                  timing: SpellerTiming | None = None) -> SyntheticSession:
+    """Пишет <directory>/bci/<name>.csv и <directory>/speller/<name>.csv (имена для python -m log_merger)"""
+    timing = timing if timing is not None else SpellerTiming()
+    device_spec: DeviceSpec = get_device(device)
+    rng: np.random.Generator = np.random.default_rng(seed)
+    flashes, rows, cols, is_correct = speller_events(letters=letters, timing=timing, rng=rng,
+                                                     start=START_TIMESTAMP + 2_000_000)
+    # Запись BCI начинается за 2 с до первой подсветки и заканчивается через 2 с после последней
+    bci_end: int = int(flashes[-1]) + 2_000_000 if len(flashes) else START_TIMESTAMP + 4_000_000
+    timestamps, values = bci_signal(device=device_spec, start=START_TIMESTAMP, end=bci_end, flashes=flashes,
+                                    is_correct=is_correct, rng=rng)
+
+    bci_file: str = os.path.join(directory, 'bci', name + '.csv')
+    speller_file: str = os.path.join(directory, 'speller', name + '.csv')
+    os.makedirs(os.path.dirname(bci_file), exist_ok=True)
+    os.makedirs(os.path.dirname(speller_file), exist_ok=True)
+    # Окончания строк \r\n, как у csv.writer, которым пишутся настоящие логи
+    with open(bci_file, 'w', newline='') as fp:
+        fp.write(','.join(['timestamp', *device_spec.channels]) + '\r\n')
+        np.savetxt(fp, np.column_stack([timestamps, values]), delimiter=',', newline='\r\n',
+                   fmt=['%d'] + ['%.6f'] * len(device_spec.channels))
+    with open(speller_file, 'w', newline='') as fp:
+        fp.write('timestamp,row,col,correct\r\n')
+        fp.writelines(
+            f'{timestamp},{row if row >= 0 else ""},{col if col >= 0 else ""},{correct}\r\n'
+            for timestamp, row, col, correct in zip(flashes.tolist(), rows.tolist(), cols.tolist(), is_correct.tolist())
+        )
+    return SyntheticSession(bci_file=bci_file, speller_file=speller_file, samples=len(timestamps), events=len(flashes))
+
+
+def generate_sessions(directory: str, device: str = 'emotiv', letters: int = 20, sessions: int = 1, seed: int = 0,
+                      timing: SpellerTiming | None = None) -> list[SyntheticSession]:
+    """sessions сессий по letters букв; у каждой сессии свой seed, производный от seed"""
+    return [
+        write_session(directory=directory, name=f'{device}_{letters}l_s{seed}_{index:02d}_v{GENERATOR_VERSION}',
+                      device=device, letters=letters, seed=seed * 1000 + index, timing=timing)
+        for index in range(sessions)
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Синтетические сессии BCI и спеллера')
+    parser.add_argument('-o', '--output-dir', required=True)
+    parser.add_argument('--device', default='emotiv')
+    parser.add_argument('--letters', type=int, default=20, help='букв в сессии (около 14 с на букву)')
+    parser.add_argument('--sessions', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for session in generate_sessions(directory=args.output_dir, device=args.device, letters=args.letters,
+                                     sessions=args.sessions, seed=args.seed):
+        print(f'{session.bci_file}: {session.samples} samples, {session.speller_file}: {session.events} events')
@@ -1 +1,2 @@
-from .classifier import BciClassifier, RandomClassifier
\ No newline at end of file
+from .classifier import BciClassifier, RandomClassifier
+from .lda import LdaClassifier
\ No newline at end of file
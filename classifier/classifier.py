@@ -2,12 +2,35 @@ import abc
 from bci_data import BciSignalBatch
 import random
 
+import numpy as np
+
 
 class BciClassifier(abc.ABC):
     @abc.abstractmethod
     def classifiy(self, data: list[BciSignalBatch]) -> float:
         ...
 
+    def classify_epoch(self, epoch: np.ndarray, batch_type: type[BciSignalBatch] | None = None) -> float:
+        """Оценка окна (length, n_channels); batch_type - NeiryBatch / EmotivBatch с теми же каналами"""
+        return float(self.classify_batch(epoch[np.newaxis], batch_type=batch_type)[0])
+
+    def classify_batch(self, epochs: np.ndarray, batch_type: type[BciSignalBatch] | None = None) -> np.ndarray:
+        """
+        Оценки окон (n_epochs, length, n_channels) одним вызовом.
+        По умолчанию - classifiy() для каждого окна; классификаторы, работающие с массивами, переопределяют.
+        """
+        if batch_type is None:
+            raise ValueError(
+                'batch_type is required to pass epochs to a classifier without a batch implementation'
+            )
+        return np.array([
+            self.classifiy(batch_type.from_array(epoch))
+            for epoch in epochs
+        ], dtype=np.float64)
+
 class RandomClassifier(BciClassifier):
     def classifiy(self, data: list[BciSignalBatch]) -> float:
-        return random.random()
\ No newline at end of file
+        return random.random()
+
+    def classify_batch(self, epochs: np.ndarray, batch_type: type[BciSignalBatch] | None = None) -> np.ndarray:
+        return np.random.random(len(epochs))
\ No newline at end of file
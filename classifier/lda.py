@@ -0,0 +1,131 @@
+"""
+Линейный классификатор P300: LDA с регуляризацией ковариации (shrinkage)
+по прореженным окнам, с необязательной пространственной фильтрацией xDAWN.
+
+Обучается на окнах, которые собирает LogMerger (любой формат, который читает DatasetReader),
+оценивает пачку окон одним матричным умножением.
+"""
+
+import numpy as np
+
+from bci_data import BciSignalBatch
+from log_merger.dataset_reader import DatasetReader
+from .classifier import BciClassifier
+
+
+class LdaClassifier(BciClassifier):
+    def __init__(self, decimation: int = 4, shrinkage: float | None = None, xdawn_components: int | None = None,
+                 center: bool = True) -> None:
+        self.decimation: int = decimation  # окно усредняется по блокам из decimation записей
+        self.shrinkage: float | None = shrinkage  # None - оценка Ледуа-Вольфа
+        self.xdawn_components: int | None = xdawn_components  # None - без пространственной фильтрации
+        self.center: bool = center  # вычитать среднее окна по каждому каналу
+
+        self.spatial_filters: np.ndarray | None = None  # (n_channels, xdawn_components)
+        self.weights: np.ndarray | None = None
+        self.bias: float = 0.0
+
+    def _features(self, epochs: np.ndarray) -> np.ndarray:
+        epochs = np.asarray(epochs, dtype=np.float64)
+        if self.center:
+            epochs = epochs - epochs.mean(axis=1, keepdims=True)
+        if self.spatial_filters is not None:
+            epochs = epochs @ self.spatial_filters
+        n_epochs, length, n_channels = epochs.shape
+        blocks: int = length // self.decimation
+        decimated: np.ndarray = epochs[:, :blocks * self.decimation].reshape(
+            n_epochs, blocks, self.decimation, n_channels
+        ).mean(axis=2)
+        return decimated.reshape(n_epochs, blocks * n_channels)
+
+    @staticmethod
+    def _xdawn(epochs: np.ndarray, labels: np.ndarray, n_components: int) -> np.ndarray:
+        """Фильтры, максимизирующие отношение мощности усреднённого ответа на цель к мощности всего сигнала"""
+        evoked: np.ndarray = epochs[labels].mean(axis=0)  # (length, n_channels)
+        signal_covariance: np.ndarray = evoked.T @ evoked
+        samples: np.ndarray = epochs.reshape(-1, epochs.shape[-1])
+        noise_covariance: np.ndarray = samples.T @ samples / len(epochs)
+        noise_covariance += 1e-9 * np.trace(noise_covariance) * np.eye(len(noise_covariance))
+        # Обобщённая задача на собственные значения через отбеливание по Холецкому
+        cholesky: np.ndarray = np.linalg.cholesky(noise_covariance)
+        inverse_cholesky: np.ndarray = np.linalg.inv(cholesky)
+        eigenvalues, eigenvectors = np.linalg.eigh(inverse_cholesky @ signal_covariance @ inverse_cholesky.T)
+        order: np.ndarray = np.argsort(eigenvalues)[::-1][:n_components]
+        return inverse_cholesky.T @ eigenvectors[:, order]
+
+    @staticmethod
+    def _ledoit_wolf(centered: np.ndarray) -> float:
+        n_samples, n_features = centered.shape
+        covariance: np.ndarray = centered.T @ centered / n_samples
+        scale: float = np.trace(covariance) / n_features
+        distance: float = np.sum(covariance ** 2) - n_features * scale ** 2
+        spread: float = (np.sum(np.sum(centered ** 2, axis=1) ** 2) - n_samples * np.sum(covariance ** 2)) / n_samples ** 2
+        return float(np.clip(spread / distance, 0.0, 1.0)) if distance > 0 else 1.0
+
+    def fit(self, epochs: np.ndarray, labels: np.ndarray) -> 'LdaClassifier':
+        """epochs - (n_epochs, length, n_channels), labels - is_correct"""
+        labels = np.asarray(labels, dtype=bool)
+        if labels.all() or not labels.any():
+            raise ValueError(
+                'Both target and non-target epochs are required to fit the classifier'
+            )
+        epochs = np.asarray(epochs, dtype=np.float64)
+        self.spatial_filters = None
+        if self.xdawn_components is not None:
+            centered_epochs: np.ndarray = epochs - epochs.mean(axis=1, keepdims=True) if self.center else epochs
+            self.spatial_filters = LdaClassifier._xdawn(centered_epochs, labels, self.xdawn_components)
+
+        features: np.ndarray = self._features(epochs)
+        target_mean: np.ndarray = features[labels].mean(axis=0)
+        nontarget_mean: np.ndarray = features[~labels].mean(axis=0)
+        centered: np.ndarray = np.where(labels[:, np.newaxis], features - target_mean, features - nontarget_mean)
+
+        shrinkage: float = self.shrinkage if self.shrinkage is not None else LdaClassifier._ledoit_wolf(centered)
+        covariance: np.ndarray = centered.T @ centered / len(centered)
+        scale: float = np.trace(covariance) / len(covariance)
+        covariance = (1 - shrinkage) * covariance + shrinkage * scale * np.eye(len(covariance))
+
+        self.weights = np.linalg.solve(covariance, target_mean - nontarget_mean)
+        self.bias = float(-self.weights @ (target_mean + nontarget_mean) / 2)
+        return self
+
+    def fit_dataset(self, dataset_file: str) -> 'LdaClassifier':
+        """Обучение на датасете merge_logs() в формате npy, npz, json или jsonl"""
+        with DatasetReader(dataset_file) as dataset:
+            return self.fit(dataset.epochs, dataset.is_correct)
+
+    def classify_batch(self, epochs: np.ndarray, batch_type: type[BciSignalBatch] | None = None) -> np.ndarray:
+        if self.weights is None:
+            raise ValueError(
+                'The classifier has not been fitted'
+            )
+        return self._features(epochs) @ self.weights + self.bias
+
+    def classifiy(self, data: list[BciSignalBatch]) -> float:
+        epoch: np.ndarray = np.array([batch.values for batch in data], dtype=np.float64)
+        return float(self.classify_batch(epoch[np.newaxis])[0])
+
+    def save(self, model_file: str) -> None:
+        with open(model_file, 'wb') as fp:
+            np.savez(
+                fp,
+                decimation=self.decimation,
+                center=self.center,
+                weights=self.weights,
+                bias=self.bias,
+                spatial_filters=self.spatial_filters if self.spatial_filters is not None else np.empty((0, 0))
+            )
+
+    @staticmethod
+    def load(model_file: str) -> 'LdaClassifier':
+        with np.load(model_file) as model:
+            spatial_filters: np.ndarray = model['spatial_filters']
+            classifier: LdaClassifier = LdaClassifier(
+                decimation=int(model['decimation']),
+                xdawn_components=spatial_filters.shape[1] if spatial_filters.size else None,
+                center=bool(model['center'])
+            )
+            classifier.weights = model['weights']
+            classifier.bias = float(model['bias'])
+            classifier.spatial_filters = spatial_filters if spatial_filters.size else None
+        return classifier
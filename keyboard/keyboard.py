@@ -10,6 +10,9 @@ class VirtualKeyboard:
         self.user_output = ''
         self.current_letter_idx = 0
         self.buttons = []
+        self.lit_cells = frozenset()  # (row, col) подсвеченных сейчас кнопок
+        self.row_cells = []
+        self.col_cells = []
         self.create_target_word_label()
         self.create_user_output_label()
         self.create_keyboard()
@@ -37,23 +40,29 @@ class VirtualKeyboard:
                 row_buttons.append(button)
             self.buttons.append(row_buttons)
 
+        self.row_cells = [frozenset((r, c) for c in range(len(self.layout[0]))) for r in range(len(self.layout))]
+        self.col_cells = [frozenset((r, c) for r in range(len(self.layout))) for c in range(len(self.layout[0]))]
+
+    def set_lit_cells(self, cells):
+        """Перекрашивает только те кнопки, состояние подсветки которых меняется"""
+        for r, c in self.lit_cells - cells:
+            self.buttons[r][c].config(bg="black", fg="sky blue")
+        for r, c in cells - self.lit_cells:
+            self.buttons[r][c].config(bg="white", fg="black", relief=tk.GROOVE)
+        self.lit_cells = cells
+
     def clear_highlight(self):
-        for r in range(len(self.layout)):
-            for c in range(len(self.layout[0])):
-                self.buttons[r][c].config(bg="black", fg="sky blue")
+        self.set_lit_cells(frozenset())
 
     def highlight(self, row=None, col=None):
         """Подсветка строки или столбца с закругленными белыми областями"""
-        # Снятие предыдущей подсветки
-        self.clear_highlight()
-
+        # Предыдущая подсветка снимается только с тех кнопок, которые не входят в новую
+        cells = frozenset()
         if row is not None:
-            for c in range(len(self.layout[0])):
-                self.buttons[row][c].config(bg="white", fg="black", relief=tk.GROOVE)
-
+            cells |= self.row_cells[row]
         if col is not None:
-            for r in range(len(self.layout)):
-                self.buttons[r][col].config(bg="white", fg="black", relief=tk.GROOVE)
+            cells |= self.col_cells[col]
+        self.set_lit_cells(cells)
 
     def check_letter(self, row=None, col=None, cycle_count=None):
         """Проверка текущего символа и логирование событий"""
@@ -7,18 +7,55 @@ from keyboard.keyboard_logger import EventLogger
 class HighlightManager:
     """Класс управления подсветкой строк и столбцов"""
 
-    def __init__(self, keyboard, logger, interval=500, interval_between_symbols=5000, interval_highlight=500):
+    def __init__(self, keyboard, logger, interval=500, interval_between_symbols=5000, interval_highlight=500,
+                 timing_recorder=None, scheduler='relative', decoder=None, poll_interval=20, stopping_policy=None,
+                 decision_timeout=3000):
         self.keyboard = keyboard
         self.logger = logger
+        # OnlineDecoder: буква выбирается по оценкам классификатора, а не берётся из target_word
+        self.decoder = decoder
+        self.poll_interval = poll_interval  # ms, как часто забирать результаты классификации
+        self.poll_process = None
+        self.type_process = None
+        self.typing = False  # последняя буква ждёт результатов классификации
+        # ms после последней подсветки буквы, через которые буква выбирается по уже полученным оценкам,
+        # даже если часть подсветок ещё не классифицирована
+        self.decision_timeout = decision_timeout
+        self.timing_recorder = timing_recorder  # StimulusTimingRecorder для замера задержек подсветок
+        if self.timing_recorder is not None:
+            self.timing_recorder.set_nominal_interval(interval_highlight + interval)
 
         self.interval = interval  # ms
         self.interval_between_symbols = interval_between_symbols  # ms
         self.interval_highlight = interval_highlight
 
+        # 'relative' - каждый шаг планируется через root.after относительно момента вызова,
+        # задержки Tk накапливаются; 'deadline' - шаги привязаны к абсолютным моментам
+        # (time.perf_counter_ns), отсчитанным от начала сессии, опоздание вычитается из следующей задержки
+        if scheduler not in ('relative', 'deadline'):
+            raise ValueError(f'Unknown scheduler "{scheduler}", expected "relative" or "deadline"')
+        self.scheduler = scheduler
+        self.deadline_ns = None  # момент, на который запланирован следующий шаг
+
+        # Для подсчёта фактического темпа подсветок (без пауз между буквами)
+        self.previous_flash_ns = None
+        self.flash_intervals_ns = 0
+        self.flash_intervals = 0
+
         self.process = None
         self.highlight_counter = 0  # Счетчик для циклов
         self.cycles = 0  # Подсчитывает, сколько раз цикл повторился
         self.max_cycles = 3  # Ограничиваем до 3 полных циклов строк и столбцов
+        # ConfidenceStoppingPolicy: подсветка буквы прекращается, как только классификатор уверен в выборе
+        self.stopping_policy = stopping_policy
+        if self.stopping_policy is not None:
+            self.max_cycles = self.stopping_policy.max_cycles
+
+        # Для подсчёта скорости набора
+        self.started_ns = None
+        self.letter_started_ns = None
+        self.letters_typed = 0
+        self.last_letter_ns = None
 
         self.default_path = [
             [0, None],
@@ -34,51 +71,190 @@ class HighlightManager:
         ]
         self.shuffled_path = random.sample(self.default_path, len(self.default_path))
 
+    @property
+    def nominal_rate(self):
+        """Заданный темп подсветок, Гц"""
+        return 1000 / (self.interval_highlight + self.interval)
+
+    @property
+    def achieved_rate(self):
+        """Фактический темп подсветок внутри букв, Гц"""
+        if not self.flash_intervals:
+            return None
+        return self.flash_intervals / (self.flash_intervals_ns / 1_000_000_000)
+
+    @property
+    def characters_per_minute(self):
+        """Скорость набора с начала сессии, включая паузы между буквами"""
+        if not self.letters_typed:
+            return None
+        return self.letters_typed / ((self.last_letter_ns - self.started_ns) / 60_000_000_000)
+
     def start(self, event, root):
+        self.deadline_ns = time.perf_counter_ns()
+        self.started_ns = self.deadline_ns
+        if self.decoder is not None:
+            self.poll_decoder()
         self.highlight_cycle_random()
         root.unbind('<Return>')
 
+    def poll_decoder(self):
+        try:
+            self.decoder.poll()
+        finally:
+            self.poll_process = self.keyboard.root.after(self.poll_interval, self.poll_decoder)
+
+    def schedule(self, delay, callback, flash=False):
+        """Планирует callback через delay мс; flash=True - callback начинает подсветку"""
+        if self.scheduler == 'deadline':
+            self.deadline_ns += delay * 1_000_000
+            remaining_ns = self.deadline_ns - time.perf_counter_ns()
+            if remaining_ns < -delay * 1_000_000:
+                # Пропущен целый шаг: отсчитываем дальше от текущего момента, а не подсвечиваем подряд
+                self.deadline_ns -= remaining_ns
+                remaining_ns = 0
+            if flash and self.timing_recorder is not None:
+                self.timing_recorder.schedule_at(self.deadline_ns)
+            delay = max(0, round(remaining_ns / 1_000_000))
+        elif flash and self.timing_recorder is not None:
+            self.timing_recorder.schedule(delay)
+        self.process = self.keyboard.root.after(delay, callback)
+
     def stop(self):
         if self.process:
             self.keyboard.root.after_cancel(self.process)
+        if self.poll_process:
+            self.keyboard.root.after_cancel(self.poll_process)
+        if self.type_process:
+            self.keyboard.root.after_cancel(self.type_process)
+        if self.decoder is not None:
+            self.decoder.close()
+        self.logger.stop()
+        if self.timing_recorder is not None:
+            self.timing_recorder.save()
 
     def highlight_cycle_random(self):
         """Подсветка в случайном порядке"""
         if self.shuffled_path:
-            timestamp = int(time.time() * 1_000_000)
+            if self.timing_recorder is not None:
+                self.timing_recorder.callback()
 
             current_el = self.shuffled_path.pop()
             self.keyboard.highlight(row=current_el[0], col=current_el[1])
+            # Принудительная отрисовка: в лог и декодеру уходит момент фактического появления подсветки,
+            # а не момент вызова обработчика
+            self.keyboard.root.update_idletasks()
+            timestamp = int(time.time() * 1_000_000)
+            if self.timing_recorder is not None:
+                self.timing_recorder.rendered(timestamp)
+
+            flash_ns = time.perf_counter_ns()
+            if self.letter_started_ns is None:
+                self.letter_started_ns = flash_ns
+            if self.previous_flash_ns is not None:
+                self.flash_intervals_ns += flash_ns - self.previous_flash_ns
+                self.flash_intervals += 1
+            self.previous_flash_ns = flash_ns
 
             letter_found = self.keyboard.check_letter(row=current_el[0], col=current_el[1], cycle_count=self.cycles)
-            EventLogger.log_event(self.logger.pathname, current_el[0], current_el[1], letter_found, timestamp)
+            self.logger.log(current_el[0], current_el[1], letter_found, timestamp)
+            if self.decoder is not None:
+                self.decoder.submit(current_el[0], current_el[1], timestamp)
 
         if self.cycles >= self.max_cycles:
-            self.cycles = 0
-
-            # Добавляем букву
-            self.keyboard.user_output += self.keyboard.target_word[self.keyboard.current_letter_idx]
-            self.keyboard.user_output_label.config(text=self.keyboard.user_output)
-
-            self.keyboard.current_letter_idx += 1
-            self.keyboard.clear_highlight()
-
-            self.process = self.keyboard.root.after(self.interval_between_symbols, self.check_end_of_word)
+            self.finish_letter()
             return
 
         if not self.shuffled_path:
             self.cycles += 1
             self.shuffled_path = random.sample(self.default_path, len(self.default_path))
+            if self.stopping_policy is not None:
+                # Решение принимается после полного цикла, дав последней подсветке обычную длительность
+                self.schedule(self.interval_highlight, self.check_stopping)
+                return
 
         # Планируем следующий шаг через заданный интервал
-        self.process = self.keyboard.root.after(self.interval_highlight, self.highlight_pause)
+        self.schedule(self.interval_highlight, self.highlight_pause)
+
+    def finish_letter(self):
+        cycles = self.cycles
+        self.cycles = 0
+
+        # Добавляем букву
+        self.typing = True
+        self.type_letter(self.keyboard.current_letter_idx, cycles,
+                         time.perf_counter_ns() + self.decision_timeout * 1_000_000)
+
+        self.keyboard.current_letter_idx += 1
+        self.keyboard.clear_highlight()
+
+        self.previous_flash_ns = None
+        self.schedule(self.interval_between_symbols, self.check_end_of_word, flash=True)
+
+    def check_stopping(self, deadline_ns=None):
+        """
+        Завершает букву или продолжает подсветку, когда классифицированы все подсветки завершённого цикла
+        (но не дольше decision_timeout), чтобы решение не принималось по неполным оценкам
+        """
+        if deadline_ns is None:
+            self.keyboard.clear_highlight()
+            deadline_ns = time.perf_counter_ns() + self.decision_timeout * 1_000_000
+        waiting = self.decoder is not None and not self.decoder.is_idle() and self.cycles < self.max_cycles
+        if waiting and time.perf_counter_ns() < deadline_ns:
+            self.schedule(self.poll_interval, lambda: self.check_stopping(deadline_ns))
+            # Ожидание оценок не входит в фактический темп подсветок
+            self.previous_flash_ns = None
+            return
+
+        if self.stopping_policy.should_stop(self.cycles, self.decoder):
+            self.finish_letter()
+        else:
+            self.schedule(self.interval, self.highlight_cycle_random, flash=True)
 
     def highlight_pause(self):
         self.keyboard.clear_highlight()
-        self.process = self.keyboard.root.after(self.interval, self.highlight_cycle_random)
+        self.schedule(self.interval, self.highlight_cycle_random, flash=True)
+
+    def type_letter(self, letter_idx, cycles, deadline_ns):
+        """
+        Добавляет букву в вывод; в онлайн-режиме - когда классифицированы все подсветки буквы
+        или наступил deadline_ns (time.perf_counter_ns)
+        """
+        self.type_process = None
+        if self.decoder is None:
+            letter = self.keyboard.target_word[letter_idx]
+        elif not self.decoder.is_idle() and time.perf_counter_ns() < deadline_ns:
+            self.type_process = self.keyboard.root.after(self.poll_interval, self.type_letter, letter_idx, cycles,
+                                                         deadline_ns)
+            return
+        else:
+            # По истечении deadline_ns неоценённые подсветки отбрасывает reset()
+            row, col = self.decoder.best_cell()
+            letter = self.keyboard.layout[row][col]
+            self.decoder.reset()
+
+        self.keyboard.user_output += letter
+        self.keyboard.user_output_label.config(text=self.keyboard.user_output)
+        self.typing = False
 
-    def check_end_of_word(self):
+        self.last_letter_ns = time.perf_counter_ns()
+        self.letters_typed += 1
+        duration_ms = (self.last_letter_ns - self.letter_started_ns) // 1_000_000 if self.letter_started_ns else 0
+        self.letter_started_ns = None
+        self.logger.log_letter(self.keyboard.target_word[letter_idx], letter, cycles, duration_ms)
+
+    def check_end_of_word(self, waited=False):
         """Проверка завершения слова и дальнейшие действия"""
+        if self.typing:
+            # Подсветки следующей буквы не должны смешаться с ещё не классифицированными
+            self.process = self.keyboard.root.after(self.poll_interval, self.check_end_of_word, True)
+            return
+        if waited:
+            # Ожидание классификации не входит в расписание: иначе планировщик 'deadline' стал бы
+            # нагонять его, укорачивая первые подсветки следующей буквы
+            self.deadline_ns = time.perf_counter_ns()
+            if self.timing_recorder is not None:
+                self.timing_recorder.schedule_at(self.deadline_ns)
         if self.keyboard.current_letter_idx >= len(self.keyboard.target_word):
             self.stop()
         else:
@@ -100,7 +276,7 @@ class HighlightManager:
                 self.keyboard.layout[current_row][c] == self.keyboard.target_word[self.keyboard.current_letter_idx] for
                 c in range(col_count))
             self.keyboard.check_letter(row=current_row, cycle_count=self.cycles)
-            EventLogger.log_event(self.logger.pathname, current_row, None, letter_found)
+            self.logger.log(current_row, None, letter_found, int(time.time() * 1_000_000))
 
         # Подсветка столбца
         elif self.highlight_counter < row_count + col_count:
@@ -112,7 +288,7 @@ class HighlightManager:
                 self.keyboard.layout[r][current_col] == self.keyboard.target_word[self.keyboard.current_letter_idx] for
                 r in range(row_count))
             self.keyboard.check_letter(col=current_col, cycle_count=self.cycles)
-            EventLogger.log_event(self.logger.pathname, None, current_col, letter_found)
+            self.logger.log(None, current_col, letter_found, int(time.time() * 1_000_000))
 
         # Увеличиваем счетчик для подсветки следующей строки или столбца
         self.highlight_counter += 1
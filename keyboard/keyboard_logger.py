@@ -1,28 +1,92 @@
+import atexit
 import csv
 import datetime
+import os
+import queue
+import threading
 import time
 
 
 class EventLogger:
     """Класс для логирования событий"""
 
-    def __init__(self, pathname=None):
+    def __init__(self, pathname=None, buffered=False):
         self.pathname = pathname if pathname else datetime.datetime.now().strftime("%Y-%m-%dT%H_%M_%S") + '.csv'
+        # Итоги по буквам: сколько циклов подсветки и времени ушло на каждую
+        self.letters_pathname = os.path.splitext(self.pathname)[0] + '.letters.csv'
+        # buffered=True - файл держится открытым, а строки пишет фоновый поток,
+        # чтобы запись на диск не попадала между подсветкой и её временной меткой
+        self.buffered = buffered
+        self.queue = None
+        self.writer_thread = None
 
     def setup(self):
         with open(self.pathname, mode='w', newline='') as file:
             writer = csv.writer(file)
             writer.writerow(["timestamp", "row", "col", "correct"])
+        with open(self.letters_pathname, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["timestamp", "target", "typed", "cycles", "duration_ms"])
+
+        if self.buffered and self.writer_thread is None:
+            self.queue = queue.SimpleQueue()
+            self.writer_thread = threading.Thread(target=self._write_events, name='EventLogger', daemon=True)
+            self.writer_thread.start()
+            atexit.register(self.stop)
+
+    def log(self, row, col, correct, timestamp):
+        if self.writer_thread is not None:
+            self.queue.put((row, col, correct, timestamp))
+        else:
+            EventLogger.log_event(self.pathname, row, col, correct, timestamp)
+
+    def log_letter(self, target, typed, cycles, duration_ms):
+        """Пишется раз в букву, после подсветок, поэтому без фонового потока"""
+        with open(self.letters_pathname, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow([int(time.time() * 1_000_000), target, typed, cycles, duration_ms])
+
+    def stop(self):
+        """Дописывает накопленные события и останавливает фоновый поток"""
+        if self.writer_thread is None:
+            return
+        self.queue.put(None)
+        self.writer_thread.join()
+        self.writer_thread = None
+        atexit.unregister(self.stop)
+
+    def _write_events(self):
+        with open(self.pathname, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            stopped = False
+            while not stopped:
+                # Ждём первое событие, затем забираем всё, что успело накопиться, и пишем одной пачкой
+                events = [self.queue.get()]
+                while True:
+                    try:
+                        events.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopped = None in events
+                writer.writerows(
+                    EventLogger._format_event(*event)
+                    for event in events
+                    if event is not None and (event[0] is not None or event[1] is not None)
+                )
+                file.flush()
+
+    @staticmethod
+    def _format_event(row, col, correct, timestamp):
+        # Логируем строку, если проверяется строка (колонка None)
+        if row is not None:
+            return [timestamp, row, None, correct]
+        # Логируем колонку, если проверяется колонка (строка None)
+        return [timestamp, None, col, correct]
 
     @staticmethod
     def log_event(pathname, row, col, correct, timestamp):
         with open(pathname, mode='a', newline='') as file:
             writer = csv.writer(file)
 
-            # Логируем строку, если проверяется строка (колонка None)
-            if row is not None:
-                writer.writerow([timestamp, row, None, correct])
-
-            # Логируем колонку, если проверяется колонка (строка None)
-            elif col is not None:
-                writer.writerow([timestamp, None, col, correct])
+            if row is not None or col is not None:
+                writer.writerow(EventLogger._format_event(row, col, correct, timestamp))
@@ -0,0 +1,132 @@
+from concurrent.futures import ThreadPoolExecutor
+import queue
+
+import numpy as np
+
+
+class OnlineDecoder:
+    """
+    Класс онлайн-классификации подсветок.
+
+    submit() запоминает подсветку, poll() (вызывается из цикла Tk через root.after) забирает
+    из Acquisition окна тех подсветок, для которых данные уже записаны, и отдаёт их
+    классификатору одной пачкой (classify_batch) в фоновом потоке. Готовые оценки возвращаются через очередь и
+    суммируются по строкам и столбцам в том же poll(), поэтому цикл Tk не ждёт классификатор.
+
+    Подсветка отбрасывается и учитывается в dropped, если её окно уже вытеснено из кольцевого буфера,
+    если источник данных закончился раньше, чем окно было записано, или если классификация её пачки
+    завершилась ошибкой (последняя ошибка - в last_error). Результаты пачек, отправленных до reset(),
+    тоже отбрасываются, чтобы не смешаться с оценками следующей буквы.
+    """
+
+    def __init__(self, classifier, acquisition, batch_type, n_rows, n_cols, shift=200, length=38, workers=1):
+        self.classifier = classifier  # BciClassifier
+        self.acquisition = acquisition  # acquisition.Acquisition
+        self.batch_type = batch_type  # NeiryBatch / EmotivBatch - каналы устройства
+        self.shift = shift  # ms, сдвиг окна относительно подсветки
+        self.length = length  # записей в окне
+        self.n_rows = n_rows
+        self.n_cols = n_cols
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='OnlineDecoder')
+        self.results = queue.SimpleQueue()
+        self.pending = []  # подсветки, окна которых ещё не записаны целиком
+        self.in_flight = 0  # пачки окон, отданные классификатору
+        self.generation = 0  # увеличивается в reset(), у каждой пачки - поколение на момент отправки
+        self.dropped = 0  # подсветки, отброшенные без оценки
+        self.last_error = None
+        self.row_scores = [0.0] * n_rows
+        self.col_scores = [0.0] * n_cols
+        self.row_flashes = [0] * n_rows
+        self.col_flashes = [0] * n_cols
+
+    def submit(self, row, col, timestamp):
+        self.pending.append((row, col, timestamp))
+
+    def poll(self):
+        while True:
+            try:
+                generation, flashes, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                self.dropped += len(flashes)
+                continue
+            self.in_flight -= 1
+            try:
+                scores = future.result()
+            except Exception as error:
+                self._drop(len(flashes), error)
+                continue
+            for row, col, score in scores:
+                self._add_score(row, col, score)
+
+        # Проверяется до get_epoch(): если источник закончился, все его записи уже в буфере
+        finished = self.acquisition.finished.is_set()
+        still_pending = []
+        flashes = []
+        epochs = []
+        for row, col, timestamp in self.pending:
+            try:
+                epoch = self.acquisition.get_epoch(timestamp=timestamp, shift_us=self.shift * 1000,
+                                                   length=self.length)
+            except ValueError as error:
+                self._drop(1, error)
+                continue
+            if epoch is None:
+                if finished:
+                    self._drop(1, None)
+                else:
+                    still_pending.append((row, col, timestamp))
+                continue
+            flashes.append((row, col))
+            epochs.append(epoch)
+        self.pending = still_pending
+
+        if epochs:
+            # np.stack копирует окна из кольцевого буфера, поэтому писатель не затрёт их во время классификации
+            future = self.executor.submit(self._classify, flashes, np.stack(epochs))
+            future.add_done_callback(
+                lambda done, generation=self.generation, flashes=flashes: self.results.put((generation, flashes, done))
+            )
+            self.in_flight += 1
+
+    def _drop(self, count, error):
+        self.dropped += count
+        if error is not None:
+            self.last_error = error
+
+    def _classify(self, flashes, epochs):
+        scores = self.classifier.classify_batch(epochs, batch_type=self.batch_type)
+        return [(row, col, float(score)) for (row, col), score in zip(flashes, scores)]
+
+    def _add_score(self, row, col, score):
+        if row is not None:
+            self.row_scores[row] += score
+            self.row_flashes[row] += 1
+        if col is not None:
+            self.col_scores[col] += score
+            self.col_flashes[col] += 1
+
+    def is_idle(self):
+        """Все отправленные подсветки классифицированы"""
+        return not self.pending and not self.in_flight
+
+    def best_cell(self):
+        row = max(range(self.n_rows), key=self.row_scores.__getitem__)
+        col = max(range(self.n_cols), key=self.col_scores.__getitem__)
+        return row, col
+
+    def reset(self):
+        """Начало следующей буквы: ещё не оценённые подсветки предыдущей отбрасываются"""
+        self.dropped += len(self.pending)
+        self.pending = []
+        self.in_flight = 0
+        self.generation += 1
+        self.row_scores = [0.0] * self.n_rows
+        self.col_scores = [0.0] * self.n_cols
+        self.row_flashes = [0] * self.n_rows
+        self.col_flashes = [0] * self.n_cols
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,96 @@
+import json
+import math
+import statistics
+import time
+
+
+class StimulusTimingRecorder:
+    """
+    Класс для замера времени подсветок.
+
+    Для каждой подсветки записывается (time.perf_counter_ns):
+    scheduled - когда подсветка должна была начаться (момент вызова root.after + задержка),
+    callback - когда Tk фактически вызвал обработчик,
+    rendered - когда после изменения кнопок отработал update_idletasks.
+    Статистика задержек сохраняется в json рядом с логом спеллера.
+    """
+
+    def __init__(self, pathname):
+        self.pathname = pathname
+        self.flashes = []
+        self.scheduled_ns = None
+        self.callback_ns = None
+        self.nominal_interval_ms = None  # interval_highlight + interval, задаёт HighlightManager
+
+    def set_nominal_interval(self, interval_ms):
+        self.nominal_interval_ms = interval_ms
+
+    def schedule(self, delay_ms):
+        """Вызывается при планировании следующей подсветки через root.after(delay_ms, ...)"""
+        self.scheduled_ns = time.perf_counter_ns() + delay_ms * 1_000_000
+
+    def schedule_at(self, deadline_ns):
+        """Вызывается, если подсветка запланирована на абсолютный момент time.perf_counter_ns"""
+        self.scheduled_ns = deadline_ns
+
+    def callback(self):
+        self.callback_ns = time.perf_counter_ns()
+
+    def rendered(self, timestamp):
+        """timestamp - временная метка подсветки, записанная в лог спеллера (мкс)"""
+        rendered_ns = time.perf_counter_ns()
+        callback_ns = self.callback_ns if self.callback_ns is not None else rendered_ns
+        # Первая подсветка не планируется через root.after
+        scheduled_ns = self.scheduled_ns if self.scheduled_ns is not None else callback_ns
+        self.flashes.append({
+            'timestamp': timestamp,
+            'scheduled_ns': scheduled_ns,
+            'callback_ns': callback_ns,
+            'rendered_ns': rendered_ns,
+        })
+        self.scheduled_ns = None
+        self.callback_ns = None
+
+    @staticmethod
+    def _describe(values_ns):
+        if not values_ns:
+            return {'mean_ms': None, 'p95_ms': None, 'max_ms': None}
+        values_ms = sorted(value / 1_000_000 for value in values_ns)
+        return {
+            'mean_ms': statistics.fmean(values_ms),
+            'p95_ms': values_ms[min(len(values_ms) - 1, math.ceil(0.95 * len(values_ms)) - 1)],
+            'max_ms': values_ms[-1],
+        }
+
+    def statistics(self):
+        lateness = [flash['callback_ns'] - flash['scheduled_ns'] for flash in self.flashes]
+        render_latency = [flash['rendered_ns'] - flash['callback_ns'] for flash in self.flashes]
+        onset_delay = [flash['rendered_ns'] - flash['scheduled_ns'] for flash in self.flashes]
+
+        # Отклонение интервала между соседними подсветками одной буквы от номинального
+        # (паузы между буквами в расчёт не входят)
+        interval_error = []
+        if self.nominal_interval_ms is not None:
+            nominal_ns = self.nominal_interval_ms * 1_000_000
+            interval_error = [
+                (current['rendered_ns'] - previous['rendered_ns']) - nominal_ns
+                for previous, current in zip(self.flashes, self.flashes[1:])
+                if current['rendered_ns'] - previous['rendered_ns'] < 1.5 * nominal_ns
+            ]
+        mean_error = statistics.fmean(interval_error) if interval_error else 0.0
+
+        return {
+            'flashes': len(self.flashes),
+            'nominal_interval_ms': self.nominal_interval_ms,
+            'lateness': self._describe(lateness),
+            'render_latency': self._describe(render_latency),
+            'onset_delay': self._describe(onset_delay),
+            'interval_error': self._describe(interval_error),
+            'jitter': self._describe([abs(error - mean_error) for error in interval_error]),
+            # Дрейф - накопленное за сессию отставание подсветок от номинального темпа
+            'drift_ms': sum(interval_error) / 1_000_000,
+        }
+
+    def save(self):
+        with open(self.pathname, mode='w') as file:
+            json.dump({'statistics': self.statistics(), 'flashes': self.flashes}, file, indent=4)
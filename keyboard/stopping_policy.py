@@ -0,0 +1,42 @@
+import math
+
+
+class ConfidenceStoppingPolicy:
+    """
+    Правило досрочной остановки подсветок буквы.
+
+    Суммарные оценки классификатора по строкам и столбцам переводятся в апостериорные
+    вероятности (softmax с температурой temperature). Подсветка буквы прекращается после
+    полного цикла, если у строк и у столбцов разница между двумя наибольшими вероятностями
+    не меньше threshold, но не раньше min_cycles и не позже max_cycles циклов.
+    """
+
+    def __init__(self, threshold=0.5, min_cycles=1, max_cycles=5, temperature=1.0):
+        self.threshold = threshold
+        self.min_cycles = min_cycles
+        self.max_cycles = max_cycles
+        self.temperature = temperature
+
+    def posterior(self, scores):
+        highest = max(scores)
+        weights = [math.exp((score - highest) / self.temperature) for score in scores]
+        total = sum(weights)
+        return [weight / total for weight in weights]
+
+    def _margin(self, scores):
+        if len(scores) < 2:
+            return 1.0
+        first, second = sorted(self.posterior(scores), reverse=True)[:2]
+        return first - second
+
+    def margin(self, decoder):
+        """Наименьшая из разниц вероятностей лучшей и второй строки и лучшего и второго столбца"""
+        return min(self._margin(decoder.row_scores), self._margin(decoder.col_scores))
+
+    def should_stop(self, cycles, decoder):
+        """cycles - число завершённых циклов подсветки строк и столбцов"""
+        if cycles >= self.max_cycles:
+            return True
+        if cycles < self.min_cycles or decoder is None:
+            return False
+        return self.margin(decoder) >= self.threshold
@@ -1,2 +1,12 @@
 from .bci_log_builder import BciLogBuilder, NeiryLogBuilder, EmotivLogBuilder
-from .log_merger import LogMerger
\ No newline at end of file
+from .clock_alignment import ClockAligner, ClockCorrection, NominalRateAligner, SyncMarkerAligner
+from .dataset_reader import DatasetReader
+from .dataset_writer import (
+    DatasetWriter, TextDatasetWriter, JsonDatasetWriter, JsonLinesDatasetWriter, NpzDatasetWriter, NpyDatasetWriter
+)
+from .log_merger import LogMerger
+from .preprocessing import Preprocessor
+from .sampling import SamplingInfo, duration_to_records, estimate_sampling_rate, resample
+from .session_cache import CacheStats, SessionCache
+from .timings import StageTimings
+from .validation import SessionReport, check_windows
\ No newline at end of file
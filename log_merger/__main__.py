@@ -0,0 +1,142 @@
+"""
+Объединение логов из командной строки (запускается из корня репозитория):
+
+    python -m log_merger --bci 'bci_logs/*.csv' --speller 'speller_logs/*.csv' -o merged.npy --workers 4
+    python -m log_merger --bci 'logs/**/bci/*.csv' --speller 'logs/**/speller/*.csv' -o merged.json --shift 150
+
+Лог BCI и лог спеллера одной сессии сопоставляются по имени файла без расширения
+(bci_logs/l4_01.csv - speller_logs/l4_01.csv), файлы без пары перечисляются и пропускаются.
+Формат выходного файла по умолчанию определяется по его расширению, устройство - по заголовку
+каждого лога BCI (--device auto). После объединения выводятся отчёты по сессиям и время этапов
+(разбор логов, вырезание окон, запись).
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+from bci_data import DEVICES
+from log_merger.bci_log_builder import BciLogBuilder
+from log_merger.dataset_writer import DATASET_WRITERS
+from log_merger.log_merger import LogMerger
+from log_merger.session_cache import SessionCache
+from log_merger.validation import SessionReport
+
+
+def _files_by_stem(pattern: str) -> dict[str, str]:
+    files: dict[str, str] = {}
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        stem: str = os.path.splitext(os.path.basename(path))[0]
+        if stem in files:
+            raise ValueError(
+                f'Two files with the same name "{stem}" match {pattern}: {files[stem]}, {path}'
+            )
+        files[stem] = path
+    return files
+
+
+def pair_log_files(bci_pattern: str, speller_pattern: str) -> tuple[list[tuple[str, str]], list[str]]:
+    """Пары (лог BCI, лог спеллера) с одинаковым именем файла в порядке имён и файлы без пары"""
+    bci_files: dict[str, str] = _files_by_stem(bci_pattern)
+    speller_files: dict[str, str] = _files_by_stem(speller_pattern)
+    log_files: list[tuple[str, str]] = [
+        (bci_files[stem], speller_files[stem]) for stem in sorted(bci_files.keys() & speller_files.keys())
+    ]
+    unpaired: list[str] = sorted(
+        [bci_files[stem] for stem in bci_files.keys() - speller_files.keys()]
+        + [speller_files[stem] for stem in speller_files.keys() - bci_files.keys()]
+    )
+    return log_files, unpaired
+
+
+def _output_format(output_file: str, output_format: str | None) -> str:
+    if output_format is not None:
+        return output_format
+    extension: str = os.path.splitext(output_file)[1].lstrip('.')
+    return extension if extension in DATASET_WRITERS else 'json'
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m log_merger', description='Объединение логов BCI и спеллера')
+    parser.add_argument('--bci', required=True, help="шаблон путей к логам BCI, например 'bci_logs/*.csv'")
+    parser.add_argument('--speller', required=True,
+                        help="шаблон путей к логам спеллера, например 'speller_logs/*.csv'")
+    parser.add_argument('-o', '--output', required=True, help='выходной файл')
+    parser.add_argument('--format', choices=list(DATASET_WRITERS), default=None,
+                        help='формат выходного файла (по умолчанию - по расширению, иначе json)')
+    parser.add_argument('--shift', type=int, default=200, help='сдвиг окна относительно стимула, мс')
+    window = parser.add_mutually_exclusive_group()
+    window.add_argument('--duration', type=int, default=None, help='длительность окна, мс (по умолчанию 300)')
+    window.add_argument('--length', type=int, default=None, help='длина окна в записях (вместо --duration)')
+    parser.add_argument('--device', choices=['auto', *DEVICES], default='auto',
+                        help='устройство BCI; auto - по заголовку каждого лога')
+    parser.add_argument('--sampling-rate', type=float, default=None,
+                        help='общая частота записей, Гц (по умолчанию - без передискретизации)')
+    parser.add_argument('--dtype', choices=('float32', 'float64'), default='float64')
+    parser.add_argument('--workers', type=int, default=1, help='число процессов для параллельной обработки сессий')
+    parser.add_argument('--cache-dir', default=None, help='каталог кэша разобранных csv (по умолчанию кэш отключён)')
+    parser.add_argument('--on-error', choices=('raise', 'skip'), default='raise',
+                        help='skip - отбросить негодные окна и сессии вместо остановки')
+    parser.add_argument('--desc', default=None, help='описание датасета (по умолчанию - параметры объединения)')
+    args = parser.parse_args(argv)
+
+    if args.length is None and args.duration is None:
+        args.duration = 300
+    try:
+        log_files, unpaired = pair_log_files(bci_pattern=args.bci, speller_pattern=args.speller)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+    for path in unpaired:
+        print(f'{path}: no matching log, skipped', file=sys.stderr)
+    if not log_files:
+        print('No pairs of BCI and speller logs found', file=sys.stderr)
+        return 1
+
+    window: str = f'duration={args.duration} мс' if args.duration is not None else f'length={args.length}'
+    desc: str = args.desc if args.desc is not None else (
+        f'Параметры объединения: shift={args.shift} мс, {window}, устройство: {args.device}, '
+        f'сессий: {len(log_files)}.'
+    )
+    cache: SessionCache | None = SessionCache(directory=args.cache_dir) if args.cache_dir else None
+    log_merger: LogMerger = LogMerger(
+        bci_log_builder=BciLogBuilder(device=args.device) if args.device != 'auto' else None,
+        dtype=np.dtype(args.dtype).type,
+        cache=cache,
+        sampling_rate=args.sampling_rate,
+        on_error=args.on_error
+    )
+
+    started: float = time.perf_counter()
+    try:
+        reports: list[SessionReport] = log_merger.merge_logs(
+            log_files=log_files,
+            output_file=args.output,
+            shift=args.shift,
+            length=args.length,
+            duration=args.duration,
+            desc=desc,
+            output_format=_output_format(output_file=args.output, output_format=args.format),
+            workers=args.workers
+        )
+    except (OSError, ValueError) as error:
+        print(f'{type(error).__name__}: {error}', file=sys.stderr)
+        return 1
+    elapsed: float = time.perf_counter() - started
+
+    for report in reports:
+        print(report.summary())
+    if cache is not None:
+        print(cache.report())
+    print(log_merger.timings.report())
+    epochs: int = sum(report.targets + report.non_targets for report in reports)
+    print(f'{epochs} epochs from {len(log_files)} sessions in {elapsed:.2f} s -> {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
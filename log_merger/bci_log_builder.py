@@ -1,101 +1,67 @@
-import abc
-from bci_data import BciSignalBatch, EmotivBatch, NeiryBatch, BciRecord
+import csv
 
+import numpy as np
 
-class BciLogBuilder(abc.ABC):
-    @abc.abstractmethod
-    def are_headers_correct(self, headers: list[str]) -> bool:
-        ...
+from bci_data import BciSignalBatch, BciRecord, BciLog, DeviceSpec, EMOTIV, NEIRY, get_device, sniff_device
 
-    @abc.abstractmethod
-    def read_values(self, values: list[str]) -> BciRecord:
-        ...
 
+class BciLogBuilder:
+    """Чтение логов BCI одного устройства; BciLogBuilder.for_file() определяет устройство по заголовку лога"""
+
+    def __init__(self, device: DeviceSpec | str) -> None:
+        self.device: DeviceSpec = get_device(device) if isinstance(device, str) else device
+
+    @staticmethod
+    def for_file(bci_file: str) -> 'BciLogBuilder':
+        return BciLogBuilder(device=sniff_device(bci_file))
+
+    @property
+    def batch_type(self) -> type[BciSignalBatch]:
+        return self.device.batch_type
 
-class NeiryLogBuilder(BciLogBuilder):
     def are_headers_correct(self, headers: list[str]) -> bool:
-        if headers[0] != 'timestamp':
-            return False
-        if (headers[1].upper() == 'O1' 
-            and headers[2].upper() == 'T3' 
-            and headers[3].upper() == 'T4' 
-            and headers[4].upper() == 'O2'
-        ):
-            return True
-        for i in range(1, 5):
-            if headers[i].upper() != f'CHANNEL_{i-1}':
-                return False
-        return True
-    
+        return self.device.matches(headers)
+
     def read_values(self, values: list[str]) -> BciRecord:
-        batch: NeiryBatch = NeiryBatch(
-            o1=float(values[1]),
-            t3=float(values[2]),
-            t4=float(values[3]),
-            o2=float(values[4])
-        )
         return BciRecord(
             timestamp=int(values[0]),
-            data=batch
+            data=self.batch_type.from_values(
+                np.array(values[1:len(self.batch_type.CHANNELS) + 1], dtype=np.float64)
+            )
         )
 
+    def get_channels(self) -> list[str]:
+        return list(self.batch_type.CHANNELS)
 
+    def read_log(self, bci_file: str, dtype: type = np.float64) -> BciLog:
+        """Читает лог целиком в колоночном виде, минуя создание BciRecord на каждую запись"""
+        channels: list[str] = self.get_channels()
+        with open(bci_file, newline='') as bci_log:
+            headers: list[str] = next(csv.reader([bci_log.readline()]), [])
+            if not self.are_headers_correct(headers):
+                raise ValueError(
+                    '''The file with the BCI log has incorrect headers'''
+                )
+            # Временные метки в микросекундах меньше 2**53 и представляются в float64 без потерь
+            raw: np.ndarray = np.loadtxt(
+                bci_log, delimiter=',', usecols=range(len(channels) + 1), dtype=np.float64, ndmin=2
+            ).reshape(-1, len(channels) + 1)
+        return BciLog(
+            timestamps=raw[:, 0].astype(np.int64),
+            values=np.ascontiguousarray(raw[:, 1:], dtype=dtype),
+            channels=channels
+        )
 
-class EmotivLogBuilder(BciLogBuilder):
-    f3: float
-    fc5: float
-    af3: float
-    f7: float
-    t7: float
-    p7: float
-    o1: float
-    o2: float
-    p8: float
-    t8: float
-    f8: float
-    af4: float
-    fc6: float
-    f4: float
+    def read_records(self, bci_file: str) -> list[BciRecord]:
+        """Лог в виде list[BciRecord], построенный блоком поверх read_log()"""
+        return self.read_log(bci_file=bci_file).to_records(self.batch_type)
 
-    def are_headers_correct(self, headers: list[str]) -> bool:
-        if headers[0] != 'timestamp':
-            return False
-        if (headers[1].upper() == 'F3' #
-            and headers[2].upper() == 'FC5' 
-            and headers[3].upper() == 'AF3' #
-            and headers[4].upper() == 'F7'
-            and headers[5].upper() == 'T7' 
-            and headers[6].upper() == 'P7' 
-            and headers[7].upper() == 'O1'
-            and headers[8].upper() == 'O2' 
-            and headers[9].upper() == 'P8' 
-            and headers[10].upper() == 'T8'
-            and headers[11].upper() == 'F8'
-            and headers[12].upper() == 'AF4' #
-            and headers[13].upper() == 'FC6'
-            and headers[14].upper() == 'F4' #
-        ):
-            return True
-        return False
-    
-    def read_values(self, values: list[str]) -> BciRecord:
-        batch: EmotivBatch = EmotivBatch(
-            f3=float(values[1]),
-            fc5=float(values[2]),
-            af3=float(values[3]),
-            f7=float(values[4]),
-            t7=float(values[5]),
-            p7=float(values[6]),
-            o1=float(values[7]),
-            o2=float(values[8]),
-            p8=float(values[9]),
-            t8=float(values[10]),
-            f8=float(values[11]),
-            af4=float(values[12]),
-            fc6=float(values[13]),
-            f4=float(values[14])
-        )
-        return BciRecord(
-            timestamp=int(values[0]),
-            data=batch
-        )
\ No newline at end of file
+
+class NeiryLogBuilder(BciLogBuilder):
+    def __init__(self) -> None:
+        super().__init__(device=NEIRY)
+
+
+class EmotivLogBuilder(BciLogBuilder):
+    def __init__(self) -> None:
+        super().__init__(device=EMOTIV)
\ No newline at end of file
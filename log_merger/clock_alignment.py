@@ -0,0 +1,141 @@
+"""
+Приведение временных меток BCI к часам спеллера.
+
+Спеллер пишет int(time.time() * 1_000_000), а временные метки Emotiv восстанавливаются
+в correct_emotiv_logs_format.py как timestamp_started + index * (1_000_000 // sampling):
+целочисленный шаг 7812 мкс вместо 7812.5 при 128 Гц накапливает 0.5 мкс на запись,
+то есть около 4 мс в минуту (correct_logs.py восстанавливает метки уже без этого дрейфа,
+NominalRateAligner нужен для логов, исправленных раньше). Выравнивание оценивает смещение
+и линейный дрейф часов BCI и пересчитывает все временные метки сессии одной операцией
+до вырезания окон.
+"""
+
+import abc
+import csv
+from dataclasses import dataclass
+import os
+from typing import Callable
+
+import numpy as np
+
+from bci_data import BciLog, sniff_device
+
+
+@dataclass
+class ClockCorrection:
+    offset: float  # мс, поправка временной метки первой записи
+    drift: float  # ppm, поправка хода часов BCI
+    # мс, последняя метка исходного лога минус начало + (n - 1) / номинальная частота (NominalRateAligner)
+    end_discrepancy: float = 0.0
+
+
+class ClockAligner(abc.ABC):
+    @abc.abstractmethod
+    def align(self, bci_log: BciLog, bci_file: str) -> tuple[BciLog, ClockCorrection]:
+        """Лог с временными метками в часах спеллера и применённая поправка"""
+        ...
+
+    @staticmethod
+    def _corrected(bci_log: BciLog, timestamps: np.ndarray) -> tuple[BciLog, ClockCorrection]:
+        original: np.ndarray = bci_log.timestamps
+        span: int = int(original[-1] - original[0]) if len(original) > 1 else 0
+        return (
+            BciLog(timestamps=timestamps, values=bci_log.values, channels=bci_log.channels),
+            ClockCorrection(
+                offset=(int(timestamps[0]) - int(original[0])) / 1000 if len(original) else 0.0,
+                drift=(int(timestamps[-1] - timestamps[0]) / span - 1) * 1_000_000 if span else 0.0
+            )
+        )
+
+
+class NominalRateAligner(ClockAligner):
+    """
+    Пересчитывает метки, восстановленные с постоянным целочисленным шагом 1_000_000 // sampling_rate
+    (correct_emotiv_logs_format.py), как начало записи + round(номер записи * 1_000_000 / sampling_rate).
+    Подходит только для таких меток: в них нет пропусков, и число записей точно отражает время записи.
+    Начало записи берётся из заголовка устройства, поэтому смещение не меняется, а расхождение
+    последней метки с началом + (n - 1) / sampling_rate (end_discrepancy) - накопленный дрейф.
+
+    Метки, которые уже восстановлены по номинальной частоте без дрейфа (correct_logs.py, шаги
+    1_000_000 / sampling_rate с округлением), остаются как есть. Метки с другим шагом отвергаются:
+    лог записан с другой частотой или с пропусками.
+    """
+
+    def __init__(self, sampling_rate: float | None = None) -> None:
+        # Гц, номинальная частота устройства; None - частота устройства, определённого по заголовку лога
+        self.sampling_rate: float | None = sampling_rate
+
+    def align(self, bci_log: BciLog, bci_file: str) -> tuple[BciLog, ClockCorrection]:
+        sampling_rate: float = (
+            self.sampling_rate if self.sampling_rate is not None else sniff_device(bci_file).sampling_rate
+        )
+        if len(bci_log) < 2:
+            return ClockAligner._corrected(bci_log=bci_log, timestamps=bci_log.timestamps)
+        # Отклонение каждой метки от номинальной сетки, отсчитанное от первой записи
+        deviations: np.ndarray = (
+            (bci_log.timestamps - bci_log.timestamps[0]) - np.arange(len(bci_log)) * (1_000_000 / sampling_rate)
+        )
+        if np.abs(deviations).max() <= 1:
+            aligned, correction = ClockAligner._corrected(bci_log=bci_log, timestamps=bci_log.timestamps)
+        else:
+            intervals: np.ndarray = np.diff(bci_log.timestamps)
+            if np.any(intervals != intervals[0]):
+                raise ValueError(
+                    f'{bci_file}: the timestamps were reconstructed neither with a constant step '
+                    f'nor at the nominal sampling rate of {sampling_rate} Hz'
+                )
+            if intervals[0] != 1_000_000 // sampling_rate:
+                raise ValueError(
+                    f'{bci_file}: the timestamp step is {intervals[0]} us, '
+                    f'the nominal sampling rate of {sampling_rate} Hz requires {int(1_000_000 // sampling_rate)} us'
+                )
+            timestamps: np.ndarray = bci_log.timestamps[0] + np.round(
+                np.arange(len(bci_log)) * (1_000_000 / sampling_rate)
+            ).astype(np.int64)
+            aligned, correction = ClockAligner._corrected(bci_log=bci_log, timestamps=timestamps)
+        correction.end_discrepancy = float(deviations[-1]) / 1000
+        return aligned, correction
+
+
+class SyncMarkerAligner(ClockAligner):
+    """
+    Линейное выравнивание по синхрометкам - событиям, отмеченным и в часах BCI, и в часах спеллера.
+    Метки сессии читаются из csv с заголовком bci_timestamp,speller_timestamp (в микросекундах),
+    по умолчанию - '<лог BCI без расширения>.sync.csv'. По одной метке оценивается только смещение,
+    по нескольким - смещение и дрейф (метод наименьших квадратов).
+    """
+
+    def __init__(self, markers_file: Callable[[str], str] | None = None) -> None:
+        self.markers_file: Callable[[str], str] = (
+            markers_file if markers_file is not None else lambda bci_file: os.path.splitext(bci_file)[0] + '.sync.csv'
+        )
+
+    @staticmethod
+    def read_markers(markers_file: str) -> tuple[np.ndarray, np.ndarray]:
+        with open(markers_file, newline='') as fp:
+            header: list[str] = next(csv.reader([fp.readline()]), [])
+            if header[:2] != ['bci_timestamp', 'speller_timestamp']:
+                raise ValueError(
+                    'The file with the sync markers must have a header with "bci_timestamp" and "speller_timestamp"'
+                )
+            markers: np.ndarray = np.loadtxt(fp, delimiter=',', usecols=(0, 1), dtype=np.int64, ndmin=2)
+        return markers[:, 0], markers[:, 1]
+
+    def align(self, bci_log: BciLog, bci_file: str) -> tuple[BciLog, ClockCorrection]:
+        bci_markers, speller_markers = SyncMarkerAligner.read_markers(self.markers_file(bci_file))
+        if not len(bci_markers):
+            raise ValueError(
+                f'{bci_file}: no sync markers'
+            )
+        # Отсчёт от первой метки, чтобы не терять точность float64 на микросекундах с 1970 года
+        origin: int = int(bci_markers[0])
+        reference: int = int(speller_markers[0])
+        if len(bci_markers) == 1:
+            slope, intercept = 1.0, float(reference - origin)
+        else:
+            slope, intercept = np.polyfit(bci_markers - origin, speller_markers - reference, deg=1)
+            intercept += reference - origin
+        timestamps: np.ndarray = bci_log.timestamps + np.round(
+            (slope - 1) * (bci_log.timestamps - origin) + intercept
+        ).astype(np.int64)
+        return ClockAligner._corrected(bci_log=bci_log, timestamps=timestamps)
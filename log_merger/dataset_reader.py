@@ -0,0 +1,200 @@
+"""
+Чтение датасетов, записанных merge_logs() / sweep_logs().
+
+Окна npy и npz не загружаются в память целиком: массив окон отображается в память (mmap),
+и с диска читаются только те окна, к которым обращаются. np.savez сохраняет массивы в zip
+без сжатия, поэтому массив окон npz отображается прямо из архива. json и jsonl разбираются
+целиком - для больших датасетов лучше npy.
+
+Пример:
+    with DatasetReader('merged.npy') as dataset:
+        targets = dataset.select(label=True)
+        for epochs, is_correct in dataset.iter_batches(batch_size=256, shuffle=True, seed=0):
+            ...
+"""
+
+import json
+import os
+import struct
+from typing import Iterator
+import zipfile
+
+import numpy as np
+
+from log_merger.epochs import SessionEpochs
+
+
+class DatasetReader:
+    def __init__(self, dataset_file: str) -> None:
+        self.dataset_file: str = dataset_file
+        extension: str = os.path.splitext(dataset_file)[1]
+        if extension == '.npy':
+            self._open_npy()
+        elif extension == '.npz':
+            self._open_npz()
+        elif extension == '.json':
+            self._open_json()
+        elif extension == '.jsonl':
+            self._open_jsonl()
+        else:
+            raise ValueError(
+                f'Unknown dataset format "{extension}", expected .npy, .npz, .json or .jsonl'
+            )
+        # (n_sessions + 1,) - окна i-й сессии: [session_offsets[i], session_offsets[i + 1])
+        self.session_offsets: np.ndarray = np.array(
+            [session['offset'] for session in self.metadata.get('sessions', [])] + [len(self.is_correct)],
+            dtype=np.int64
+        )
+
+    def _open_npy(self) -> None:
+        stem: str = os.path.splitext(self.dataset_file)[0]
+        with open(stem + '.meta.json') as fp:
+            self.metadata: dict = json.load(fp)
+        self.epochs: np.ndarray = np.load(self.dataset_file, mmap_mode='r')
+        self.is_correct: np.ndarray = np.load(stem + '.labels.npy')
+
+    def _open_npz(self) -> None:
+        with np.load(self.dataset_file) as archive:
+            self.metadata = json.loads(str(archive['metadata']))
+            self.is_correct = archive['is_correct']
+        self.epochs = DatasetReader._map_npz_member(npz_file=self.dataset_file, name='epochs')
+
+    @staticmethod
+    def _map_npz_member(npz_file: str, name: str) -> np.ndarray:
+        """Отображение в память массива из архива npz (для сжатого архива - обычная загрузка)"""
+        with zipfile.ZipFile(npz_file) as archive:
+            info: zipfile.ZipInfo = archive.getinfo(name + '.npy')
+        if info.compress_type != zipfile.ZIP_STORED:
+            with np.load(npz_file) as archive:
+                return archive[name]
+        with open(npz_file, 'rb') as fp:
+            # Локальный заголовок файла в zip: 30 байт, затем имя и дополнительное поле
+            fp.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', fp.read(4))
+            fp.seek(info.header_offset + 30 + name_length + extra_length)
+            version: tuple[int, int] = np.lib.format.read_magic(fp)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+            offset: int = fp.tell()
+        if not shape or 0 in shape:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(npz_file, dtype=dtype, mode='r', offset=offset, shape=shape,
+                         order='F' if fortran_order else 'C')
+
+    def _open_json(self) -> None:
+        with open(self.dataset_file) as fp:
+            dataset: dict = json.load(fp)
+        self.metadata = {key: value for key, value in dataset.items() if key != 'data'}
+        self.epochs = DatasetReader._stack_epochs([datapoint['bci'] for datapoint in dataset['data']])
+        self.is_correct = np.array([datapoint['is_correct'] for datapoint in dataset['data']], dtype=bool)
+        if 'sessions' not in self.metadata:
+            # json, записанный до того, как в него стали писать список сессий
+            self.metadata['sessions'] = [{'offset': 0, 'count': len(self.is_correct)}]
+
+    def _open_jsonl(self) -> None:
+        with open(self.dataset_file) as fp:
+            self.metadata = json.loads(fp.readline())
+            datapoints: list[dict] = [json.loads(line) for line in fp]
+        # Последняя строка - список сессий и признак неполного датасета (см. dataset_writer.py)
+        if datapoints and 'bci' not in datapoints[-1]:
+            self.metadata.update(datapoints.pop())
+        self.epochs = DatasetReader._stack_epochs([datapoint['bci'] for datapoint in datapoints])
+        self.is_correct = np.array([datapoint['is_correct'] for datapoint in datapoints], dtype=bool)
+        if 'sessions' in self.metadata:
+            return
+        # Без последней строки (writer не был закрыт) границы сессий восстанавливаются по окнам
+        session_indices: np.ndarray = np.array([datapoint['session'] for datapoint in datapoints], dtype=np.int64)
+        counts: np.ndarray = np.bincount(session_indices) if len(session_indices) else np.zeros(0, dtype=np.int64)
+        offsets: np.ndarray = np.concatenate([[0], np.cumsum(counts)[:-1]]) if len(counts) else counts
+        self.metadata['sessions'] = [
+            {'offset': int(offset), 'count': int(count)} for offset, count in zip(offsets, counts)
+        ]
+
+    @staticmethod
+    def _stack_epochs(epochs: list[list[list[float]]]) -> np.ndarray:
+        try:
+            return np.array(epochs, dtype=np.float64)
+        except ValueError:
+            raise ValueError(
+                'The dataset windows have different lengths and cannot be read as one array'
+            )
+
+    def __enter__(self) -> 'DatasetReader':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Освобождает отображение в память. Оно закрывается, когда удалены и все полученные из него
+        представления (окна сессий, срезы), поэтому они остаются корректными и после close().
+        """
+        self.epochs = np.empty((0,) + self.epochs.shape[1:], dtype=self.epochs.dtype)
+        self.is_correct = np.empty(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.is_correct)
+
+    def __getitem__(self, index: int | slice | np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Окна и метки по номеру, срезу или массиву номеров (читаются с диска только они)"""
+        return self.epochs[index], self.is_correct[index]
+
+    @property
+    def complete(self) -> bool:
+        """False, если объединение было прервано ошибкой и в датасете только часть сессий"""
+        return self.metadata.get('complete', True)
+
+    @property
+    def channels(self) -> list[str]:
+        return self.metadata.get('channels', [])
+
+    @property
+    def n_sessions(self) -> int:
+        return len(self.session_offsets) - 1
+
+    def session(self, index: int) -> SessionEpochs:
+        """Окна index-й сессии - представление без копирования"""
+        start, end = self.session_offsets[index], self.session_offsets[index + 1]
+        return SessionEpochs(
+            epochs=self.epochs[start:end],
+            is_correct=self.is_correct[start:end],
+            channels=self.channels,
+            metadata=self.metadata['sessions'][index]
+        )
+
+    def iter_sessions(self) -> Iterator[SessionEpochs]:
+        for index in range(self.n_sessions):
+            yield self.session(index)
+
+    def indices(self, label: bool | None = None, sessions: list[int] | None = None) -> np.ndarray:
+        """Номера окон с меткой label из сессий sessions (None - без отбора)"""
+        mask: np.ndarray = np.ones(len(self), dtype=bool)
+        if label is not None:
+            mask &= self.is_correct == label
+        if sessions is not None:
+            session_of_epoch: np.ndarray = np.repeat(np.arange(self.n_sessions), np.diff(self.session_offsets))
+            mask &= np.isin(session_of_epoch, sessions)
+        return np.flatnonzero(mask)
+
+    def select(self, label: bool | None = None, sessions: list[int] | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Копия отобранных окон и их меток"""
+        return self[self.indices(label=label, sessions=sessions)]
+
+    def iter_batches(self, batch_size: int, indices: np.ndarray | None = None, shuffle: bool = False,
+                     seed: int | None = None, drop_last: bool = False) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """
+        Мини-пакеты (epochs, is_correct) по batch_size окон из indices (по умолчанию - всех окон).
+        В памяти одновременно находится только один пакет; внутри пакета окна идут по возрастанию
+        номера, чтобы чтение с диска было последовательным.
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+        if shuffle:
+            indices = np.random.default_rng(seed).permutation(indices)
+        end: int = len(indices) - len(indices) % batch_size if drop_last else len(indices)
+        for start in range(0, end, batch_size):
+            batch: np.ndarray = np.sort(indices[start:start + batch_size])
+            yield self[batch]
@@ -0,0 +1,287 @@
+"""
+Форматы выходного файла merge_logs().
+
+json  - исходный формат: {'desc': ..., 'data': [{'is_correct': ..., 'bci': [[...], ...]}, ...], ...},
+        остальные метаданные пишутся после 'data'
+jsonl - первая строка - метаданные, далее по строке на окно: {'session': ..., 'is_correct': ..., 'bci': ...},
+        последняя строка - список сессий (sessions, skipped_sessions), он известен только после всех окон
+npz   - один архив с массивами epochs (n_events, length, n_channels), is_correct (n_events,),
+        session_offsets (n_sessions + 1,) и строкой metadata (json)
+npy   - <stem>.npy с окнами, <stem>.labels.npy с метками и <stem>.meta.json с метаданными;
+        окна можно открыть без разбора через np.load('<stem>.npy', mmap_mode='r')
+
+Метаданные: desc, shift, length, channels, dtype, длительность окна и общая частота записей (duration и
+sampling_rate, если заданы), параметры предобработки (preprocessing, если она задана) и список сессий
+с их смещениями в массиве окон и отчётами проверки (см. validation.py), а также отчёты о пропущенных
+сессиях.
+
+json, jsonl и npy пишутся потоково: каждая сессия дописывается в файл сразу после обработки,
+поэтому в памяти находится не больше одной сессии, а при падении на очередной сессии
+уже записанные остаются в файле. npz собирается в памяти целиком и пишется при закрытии.
+
+Если объединение прервано ошибкой, writer, закрытый через with, сохраняет обработанные сессии
+и помечает датасет неполным: в метаданные добавляются "complete": false и текст ошибки "error"
+(в json - после "data", в jsonl - в последней строке). У полного датасета этих полей нет.
+"""
+
+import abc
+import json
+import os
+
+import numpy as np
+
+from log_merger.epochs import SessionEpochs
+
+
+class DatasetWriter(abc.ABC):
+    def __init__(self, output_file: str, desc: str, shift: int, length: int, channels: list[str],
+                 dtype: type = np.float64, preprocessing: dict | None = None, duration: int | None = None,
+                 sampling_rate: float | None = None) -> None:
+        self.output_file: str = output_file
+        self.metadata: dict = {
+            'desc': desc,
+            'shift': shift,
+            'length': length,
+            'channels': list(channels),
+            'dtype': np.dtype(dtype).name,
+            'sessions': []
+        }
+        if duration is not None:
+            self.metadata['duration'] = duration
+        if sampling_rate is not None:
+            self.metadata['sampling_rate'] = sampling_rate
+        if preprocessing is not None:
+            self.metadata['preprocessing'] = preprocessing
+        self.n_epochs: int = 0
+
+    def __enter__(self) -> 'DatasetWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # Закрываем и при ошибке, чтобы сохранить уже обработанные сессии, но помечаем датасет неполным
+        if exc_type is not None:
+            self.mark_incomplete(error=f'{exc_type.__name__}: {exc_value}')
+        self.close()
+
+    def mark_incomplete(self, error: str) -> None:
+        """Объединение прервано: close() запишет в метаданные complete=False и error"""
+        self.metadata['complete'] = False
+        self.metadata['error'] = error
+
+    @property
+    def complete(self) -> bool:
+        return self.metadata.get('complete', True)
+
+    def _add_session(self, bci_file: str, speller_file: str, count: int, session_metadata: dict | None = None) -> None:
+        self.metadata['sessions'].append({
+            'bci_file': bci_file,
+            'speller_file': speller_file,
+            'offset': self.n_epochs,
+            'count': count,
+            **(session_metadata or {})
+        })
+        self.n_epochs += count
+
+    def skip_session(self, report: dict) -> None:
+        """Сессия пропущена (LogMerger(on_error='skip')), её отчёт сохраняется в метаданных"""
+        self.metadata.setdefault('skipped_sessions', []).append(report)
+
+    def _check_length(self, session: SessionEpochs) -> None:
+        if session.epochs.shape[1] != self.metadata['length']:
+            raise ValueError(
+                f'The session windows have {session.epochs.shape[1]} records instead of {self.metadata["length"]}: '
+                'sessions recorded at different sampling rates must be resampled to a common sampling_rate'
+            )
+
+    @abc.abstractmethod
+    def write_session(self, session: SessionEpochs, bci_file: str, speller_file: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        ...
+
+
+class TextDatasetWriter(DatasetWriter):
+    """Текстовые форматы принимают и окна, вырезанные поштучно (в том числе обрезанные в конце лога)"""
+    @abc.abstractmethod
+    def write_datapoints(self, datapoints: list[dict[str, list[list[float]] | bool]], bci_file: str,
+                         speller_file: str, metadata: dict | None = None) -> None:
+        ...
+
+    def write_session(self, session: SessionEpochs, bci_file: str, speller_file: str) -> None:
+        self.write_datapoints(datapoints=session.to_datapoints(), bci_file=bci_file, speller_file=speller_file,
+                              metadata=session.metadata)
+
+
+class JsonDatasetWriter(TextDatasetWriter):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.fp = open(self.output_file, 'w')
+        # Начало побайтно совпадает с json.dump({'desc': ..., 'data': [...]})
+        self.fp.write('{"desc": ' + json.dumps(self.metadata['desc']))
+        if 'preprocessing' in self.metadata:
+            self.fp.write(', "preprocessing": ' + json.dumps(self.metadata['preprocessing']))
+        self.fp.write(', "data": [')
+
+    def write_datapoints(self, datapoints: list[dict[str, list[list[float]] | bool]], bci_file: str,
+                         speller_file: str, metadata: dict | None = None) -> None:
+        for index, datapoint in enumerate(datapoints):
+            if self.n_epochs or index:
+                self.fp.write(', ')
+            self.fp.write(json.dumps(datapoint))
+        self._add_session(bci_file=bci_file, speller_file=speller_file, count=len(datapoints),
+                          session_metadata=metadata)
+        self.fp.flush()
+
+    def close(self) -> None:
+        if self.fp.closed:
+            return
+        self.fp.write(']')
+        # Остальные метаданные - после окон, когда известны все сессии
+        for key, value in self.metadata.items():
+            if key not in ('desc', 'preprocessing'):
+                self.fp.write(', ' + json.dumps(key) + ': ' + json.dumps(value))
+        self.fp.write('}')
+        self.fp.close()
+
+
+class JsonLinesDatasetWriter(TextDatasetWriter):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.fp = open(self.output_file, 'w')
+        header: dict = {key: value for key, value in self.metadata.items() if key != 'sessions'}
+        self.fp.write(json.dumps(header, ensure_ascii=False) + '\n')
+
+    def write_datapoints(self, datapoints: list[dict[str, list[list[float]] | bool]], bci_file: str,
+                         speller_file: str, metadata: dict | None = None) -> None:
+        session_index: int = len(self.metadata['sessions'])
+        self.fp.writelines(
+            json.dumps({'session': session_index, **datapoint}) + '\n'
+            for datapoint in datapoints
+        )
+        self._add_session(bci_file=bci_file, speller_file=speller_file, count=len(datapoints),
+                          session_metadata=metadata)
+        self.fp.flush()
+
+    def close(self) -> None:
+        if self.fp.closed:
+            return
+        trailer: dict = {
+            key: self.metadata[key] for key in ('sessions', 'skipped_sessions', 'complete', 'error')
+            if key in self.metadata
+        }
+        self.fp.write(json.dumps(trailer, ensure_ascii=False) + '\n')
+        self.fp.close()
+
+
+class _BufferedBinaryDatasetWriter(DatasetWriter):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.sessions: list[SessionEpochs] = []
+
+    def write_session(self, session: SessionEpochs, bci_file: str, speller_file: str) -> None:
+        self._check_length(session)
+        self._add_session(bci_file=bci_file, speller_file=speller_file, count=len(session),
+                          session_metadata=session.metadata)
+        self.sessions.append(session)
+
+    def _concatenate(self) -> tuple[np.ndarray, np.ndarray]:
+        if not self.sessions:
+            return (
+                np.empty((0, self.metadata['length'], len(self.metadata['channels'])), dtype=self.metadata['dtype']),
+                np.empty(0, dtype=bool)
+            )
+        return (
+            np.concatenate([session.epochs for session in self.sessions]).astype(self.metadata['dtype'], copy=False),
+            np.concatenate([session.is_correct for session in self.sessions])
+        )
+
+
+class NpzDatasetWriter(_BufferedBinaryDatasetWriter):
+    def close(self) -> None:
+        epochs, is_correct = self._concatenate()
+        session_offsets: np.ndarray = np.array(
+            [session['offset'] for session in self.metadata['sessions']] + [self.n_epochs], dtype=np.int64
+        )
+        with open(self.output_file, 'wb') as fp:
+            np.savez(fp, epochs=epochs, is_correct=is_correct, session_offsets=session_offsets,
+                     metadata=np.array(json.dumps(self.metadata)))
+
+
+class NpyDatasetWriter(DatasetWriter):
+    """
+    Дописывает окна в конец .npy и после каждой сессии перезаписывает заголовок с новой длиной.
+    numpy резервирует в заголовке место под рост первой размерности, поэтому его длина не меняется.
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        stem: str = os.path.splitext(self.output_file)[0]
+        self.epochs_file: str = stem + '.npy'
+        self.labels_file: str = stem + '.labels.npy'
+        self.metadata_file: str = stem + '.meta.json'
+        self.metadata['epochs_file'] = os.path.basename(self.epochs_file)
+        self.metadata['labels_file'] = os.path.basename(self.labels_file)
+
+        self.epochs_fp = open(self.epochs_file, 'wb')
+        self.labels_fp = open(self.labels_file, 'wb')
+        self.epochs_header_size: int = self._write_header(fp=self.epochs_fp, dtype=np.dtype(self.metadata['dtype']),
+                                                          shape=self._epochs_shape())
+        self.labels_header_size: int = self._write_header(fp=self.labels_fp, dtype=np.dtype(bool),
+                                                          shape=(self.n_epochs,))
+        self._write_metadata()
+
+    def _epochs_shape(self) -> tuple[int, int, int]:
+        return self.n_epochs, self.metadata['length'], len(self.metadata['channels'])
+
+    @staticmethod
+    def _write_header(fp, dtype: np.dtype, shape: tuple[int, ...], header_size: int | None = None) -> int:
+        end: int = fp.seek(0, os.SEEK_END)
+        fp.seek(0)
+        np.lib.format.write_array_header_1_0(fp, {
+            'descr': np.lib.format.dtype_to_descr(dtype),
+            'fortran_order': False,
+            'shape': shape
+        })
+        written_size: int = fp.tell()
+        if header_size is not None and written_size != header_size:
+            raise RuntimeError(
+                'The npy header outgrew the space reserved for it'
+            )
+        fp.seek(max(end, written_size))
+        fp.flush()
+        return written_size
+
+    def _write_metadata(self) -> None:
+        with open(self.metadata_file, 'w') as fp:
+            json.dump(self.metadata, fp, ensure_ascii=False, indent=4)
+
+    def write_session(self, session: SessionEpochs, bci_file: str, speller_file: str) -> None:
+        self._check_length(session)
+        self.epochs_fp.write(np.ascontiguousarray(session.epochs, dtype=self.metadata['dtype']).data)
+        self.labels_fp.write(np.ascontiguousarray(session.is_correct, dtype=bool).data)
+        self._add_session(bci_file=bci_file, speller_file=speller_file, count=len(session),
+                          session_metadata=session.metadata)
+        self._write_header(fp=self.epochs_fp, dtype=np.dtype(self.metadata['dtype']), shape=self._epochs_shape(),
+                           header_size=self.epochs_header_size)
+        self._write_header(fp=self.labels_fp, dtype=np.dtype(bool), shape=(self.n_epochs,),
+                           header_size=self.labels_header_size)
+        self._write_metadata()
+
+    def skip_session(self, report: dict) -> None:
+        super().skip_session(report=report)
+        self._write_metadata()
+
+    def close(self) -> None:
+        self.epochs_fp.close()
+        self.labels_fp.close()
+        if not self.complete:
+            self._write_metadata()
+
+
+DATASET_WRITERS: dict[str, type[DatasetWriter]] = {
+    'json': JsonDatasetWriter,
+    'jsonl': JsonLinesDatasetWriter,
+    'npz': NpzDatasetWriter,
+    'npy': NpyDatasetWriter,
+}
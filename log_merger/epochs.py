@@ -0,0 +1,23 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass
+class SessionEpochs:
+    """Окна всех стимулов одной сессии"""
+    epochs: np.ndarray  # (n_events, length, n_channels)
+    is_correct: np.ndarray  # bool, (n_events,)
+    channels: list[str]
+    metadata: dict = field(default_factory=dict)  # частота, пропуски и т.п., попадает в метаданные сессии
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def to_datapoints(self) -> list[dict[str, list[list[float]] | bool]]:
+        return [
+            {
+                'is_correct': is_correct,
+                'bci': epoch
+            } for is_correct, epoch in zip(self.is_correct.tolist(), self.epochs.tolist())
+        ]
@@ -1,18 +1,43 @@
 """
-Объединяет несколько пар файлов, содержащих данные со спеллера и с BCI, в один json файл
-Перебирает все записи со спеллера и сопоставляет каждой из них length записей, сделанных через
-shift миллисекунд после них.
+Объединяет несколько пар файлов, содержащих данные со спеллера и с BCI, в один датасет
+(json, jsonl, npz или npy, см. dataset_writer.py).
+Перебирает все записи со спеллера и сопоставляет каждой из них length записей (или записи за duration
+миллисекунд), сделанных через shift миллисекунд после них.
 
 Основная функция - merge_logs(), остальные - вспомогательные.
 
-В секции if __name__ == '__main__' приведён пример использования
+Запуск из командной строки: python -m log_merger (см. __main__.py)
 
 Аргументы:
 log_files: list[tuple[str, str]] - список пар путей к исходным файлам (сначала bci, потом спеллер)
 output_file: str - путь к выходному файлу
 shift: int - сдвиг окна (в миллисекундах) относительно появления стимула (подсветки)
-length: int - длина окна (в записях)
+length: int | None - длина окна (в записях); задаётся ровно один из length и duration
+duration: int | None - длительность окна (в миллисекундах), задаётся вместо length; число записей
+    определяется по частоте записей сессии, которая вычисляется по временным меткам
 desc: str - описание датасета (комментарий)
+output_format: str - формат выходного файла: 'json' (по умолчанию), 'jsonl', 'npz' или 'npy' (см. dataset_writer.py)
+workers: int - число процессов, между которыми распределяются сессии (1 - без пула процессов)
+
+Фильтрация, прореживание и коррекция базовой линии задаются через LogMerger(preprocessor=Preprocessor(...))
+(см. preprocessing.py), их параметры записываются в метаданные датасета.
+LogMerger(sampling_rate=...) приводит все сессии к общей частоте записей, тогда окна длительностью
+duration имеют одинаковую длину и для сессий с разных устройств. Окна, захватывающие пропуск в логе BCI,
+отбрасываются (см. sampling.py).
+
+Перед вырезанием окон каждая сессия проверяется (см. validation.py). При LogMerger(on_error='raise')
+(по умолчанию) окно вне записи BCI или не помещающееся в неё целиком прерывает объединение,
+при on_error='skip' такие окна и сессии, которые не удалось прочитать, отбрасываются.
+merge_logs() возвращает отчёты по сессиям, они же записываются в метаданные датасета.
+LogMerger.validate() проверяет сессии без объединения.
+
+LogMerger(clock_aligner=...) приводит временные метки BCI к часам спеллера до вырезания окон
+(см. clock_alignment.py), поправки записываются в отчёты по сессиям.
+
+LogMerger() без bci_log_builder определяет устройство каждого лога BCI по его заголовку
+(см. bci_data/devices.py), поэтому можно объединять сессии с разных устройств без настройки
+для каждого файла; устройство сессии записывается в её отчёт. Сессии устройств с разными каналами
+объединяются только в текстовые форматы.
 
 Пример выходного файла:
 {
@@ -30,12 +55,27 @@ desc: str - описание датасета (комментарий)
 }
 """
 
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
 import csv
+import functools
 from dataclasses import dataclass
-import json
+import time
+from typing import Any, Callable, Iterator
+
+import numpy as np
 
-from bci_data import BciRecord
-from bci_log_builder import BciLogBuilder, NeiryLogBuilder, EmotivLogBuilder
+from bci_data import BciLog, BciRecord
+from log_merger.bci_log_builder import BciLogBuilder
+from log_merger.clock_alignment import ClockAligner, ClockCorrection
+from log_merger.dataset_writer import DatasetWriter, TextDatasetWriter, DATASET_WRITERS
+from log_merger.epochs import SessionEpochs
+from log_merger.preprocessing import Preprocessor
+from log_merger.sampling import SamplingInfo, duration_to_records, estimate_sampling_rate, resample
+from log_merger.validation import SessionReport, check_windows
+from log_merger.session_cache import CacheStats, SessionCache
+from log_merger.timings import StageTimings
 
 
 @dataclass
@@ -44,23 +84,84 @@ class SpellerRecord:
     is_correct: bool
 
 
+@dataclass
+class SpellerLog:
+    timestamps: np.ndarray  # int64, (n_events,)
+    is_correct: np.ndarray  # bool, (n_events,)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
 class LogMerger:
-    def __init__(self, bci_log_builder: BciLogBuilder) -> None:
-        self.bci_log_builder: BciLogBuilder = bci_log_builder
+    def __init__(self, bci_log_builder: BciLogBuilder | None = None, dtype: type = np.float64, columnar: bool = True,
+                 batched: bool = True, cache: SessionCache | None = None,
+                 preprocessor: Preprocessor | None = None, sampling_rate: float | None = None,
+                 gap_tolerance: float = 1.5, on_error: str = 'raise', clock_aligner: ClockAligner | None = None) -> None:
+        if on_error not in ('raise', 'skip'):
+            raise ValueError(
+                f'Unknown error policy "{on_error}", expected "raise" or "skip"'
+            )
+        self.bci_log_builder: BciLogBuilder | None = bci_log_builder  # None - по заголовку каждого лога
+        self.dtype: type = dtype  # np.float32 вдвое уменьшает объём памяти под сигнал
+        self.columnar: bool = columnar  # False - старый путь через list[BciRecord]
+        # True - окна всех стимулов сессии вырезаются за один проход (только для columnar)
+        self.batched: bool = batched
+        self.cache: SessionCache | None = cache  # кэш разобранных csv (только для columnar)
+        # фильтрация, прореживание и базовая линия (только для columnar и batched)
+        self.preprocessor: Preprocessor | None = preprocessor
+        # Гц, общая частота, к которой приводятся все сессии; None - без передискретизации
+        self.sampling_rate: float | None = sampling_rate
+        # интервал между записями больше gap_tolerance обычных считается пропуском
+        self.gap_tolerance: float = gap_tolerance
+        # 'raise' - прервать объединение на негодной сессии, 'skip' - отбросить негодные окна и сессии
+        self.on_error: str = on_error
+        # приведение временных меток BCI к часам спеллера; None - метки используются как есть
+        self.clock_aligner: ClockAligner | None = clock_aligner
+        # время по этапам (см. timings.py), накапливается по всем вызовам, как статистика кэша
+        self.timings: StageTimings = StageTimings()
+
+
+    def _get_bci_log_builder(self, bci_file: str) -> BciLogBuilder:
+        if self.bci_log_builder is not None:
+            return self.bci_log_builder
+        return BciLogBuilder.for_file(bci_file=bci_file)
 
 
     def _read_bci_log(self, bci_file: str) -> list[BciRecord]:
-        with open(bci_file, newline='') as bci_log:
-            bci_log_reader = csv.reader(bci_log, delimiter=',')
-            headers = next(bci_log_reader)
-            if (not self.bci_log_builder.are_headers_correct(headers)):
-                raise ValueError(
-                    '''The file with the BCI log has incorrect headers'''
-                )
-            return [
-                self.bci_log_builder.read_values(record)
-                for record in bci_log_reader
-            ]
+        # Записи строятся блоком поверх колоночного лога: значения - представления строк без копирования
+        return self._get_bci_log_builder(bci_file=bci_file).read_records(bci_file=bci_file)
+
+
+    def _load_bci_log(self, bci_file: str) -> BciLog:
+        bci_log_builder: BciLogBuilder = self._get_bci_log_builder(bci_file=bci_file)
+        if self.cache is None:
+            return bci_log_builder.read_log(bci_file=bci_file, dtype=self.dtype)
+
+        def parse() -> dict[str, np.ndarray]:
+            bci_log: BciLog = bci_log_builder.read_log(bci_file=bci_file, dtype=self.dtype)
+            return {'timestamps': bci_log.timestamps, 'values': bci_log.values}
+
+        arrays: dict[str, np.ndarray] = self.cache.get_or_parse(
+            path=bci_file,
+            kind=f'{bci_log_builder.device.name}-{np.dtype(self.dtype).name}',
+            parse=parse
+        )
+        return BciLog(
+            timestamps=arrays['timestamps'],
+            values=arrays['values'],
+            channels=bci_log_builder.get_channels()
+        )
+
+
+    @staticmethod
+    def _check_speller_headers(header: list[str]) -> None:
+        if header[0] != 'timestamp' or header[1] != 'row' or header[2] != 'col' or header[3] != 'correct':
+            raise ValueError(
+                '''The file with the speller log has wrong data formant. 
+                It must have a header with "timestamp", "row", "col" and "correct", 
+                separated by commas'''
+            )
 
 
     @staticmethod
@@ -68,12 +169,7 @@ class LogMerger:
         with open(speller_file, newline='') as gaze_tracking_log:
             speller_log_reader = csv.reader(gaze_tracking_log, delimiter=',')
             header = next(speller_log_reader)
-            if header[0] != 'timestamp' or header[1] != 'row' or header[2] != 'col' or header[3] != 'correct':
-                raise ValueError(
-                    '''The file with the speller log has wrong data formant. 
-                    It must have a header with "timestamp", "row", "col" and "correct", 
-                    separated by commas'''
-                )
+            LogMerger._check_speller_headers(header)
             return [
                 SpellerRecord(
                     timestamp=int(record[0]),
@@ -82,6 +178,20 @@ class LogMerger:
             ]
 
 
+    @staticmethod
+    def _load_speller_log(speller_file: str) -> SpellerLog:
+        with open(speller_file, newline='') as gaze_tracking_log:
+            header: list[str] = next(csv.reader([gaze_tracking_log.readline()]), [])
+            LogMerger._check_speller_headers(header)
+            raw: np.ndarray = np.loadtxt(
+                gaze_tracking_log, delimiter=',', usecols=(0, 3), dtype=str, ndmin=2
+            ).reshape(-1, 2)
+        return SpellerLog(
+            timestamps=raw[:, 0].astype(np.int64),
+            is_correct=raw[:, 1] == 'True'
+        )
+
+
     @staticmethod
     def _find_start_of_time_interval(bci_log: list[BciRecord], timestamp: int, start=0, end=-1) -> int:
         if start < 0 or start >= len(bci_log):
@@ -104,7 +214,35 @@ class LogMerger:
 
 
     @staticmethod
-    def _get_datapoint(bci_log: list[BciRecord], speller_record: SpellerRecord, shift: int, length: int) \
+    def _get_datapoint(bci_log: BciLog | list[BciRecord], speller_record: SpellerRecord, shift: int, length: int) \
+            -> dict[str, list[list[float]] | bool]:
+        if not isinstance(bci_log, BciLog):
+            return LogMerger._get_record_datapoint(bci_log=bci_log, speller_record=speller_record,
+                                                   shift=shift, length=length)
+
+        start_position: int = int(np.searchsorted(bci_log.timestamps, speller_record.timestamp))
+        if start_position == len(bci_log):
+            raise ValueError(
+                'The bci log period and the speller log period do not overlap'
+            )
+
+        shifted_timestamp: int = int(bci_log.timestamps[start_position]) + shift * 1000
+        shifted_position: int = int(np.searchsorted(bci_log.timestamps, shifted_timestamp))
+        if shifted_position == len(bci_log):
+            raise ValueError(
+                'The bci log period and the speller log period do not overlap'
+            )
+
+        end_position: int = shifted_position + length
+
+        return {
+            'is_correct': speller_record.is_correct,
+            'bci': bci_log.values[shifted_position:end_position].tolist()
+        }
+
+
+    @staticmethod
+    def _get_record_datapoint(bci_log: list[BciRecord], speller_record: SpellerRecord, shift: int, length: int) \
             -> dict[str, list[list[float]] | bool]:
         start_position: int = LogMerger._find_start_of_time_interval(bci_log=bci_log, timestamp=speller_record.timestamp)
         if start_position == -1:
@@ -112,7 +250,7 @@ class LogMerger:
                 'The bci log period and the speller log period do not overlap'
             )
 
-        shifted_timestamp: int = bci_log[start_position].timestamp + shift
+        shifted_timestamp: int = bci_log[start_position].timestamp + shift * 1000
         shifted_position: int = LogMerger._find_start_of_time_interval(bci_log=bci_log, timestamp=shifted_timestamp,
                                                             start=start_position)
         if shifted_position == -1:
@@ -131,60 +269,530 @@ class LogMerger:
         }
 
 
-    def _combine_session_logs(self, bci_file: str, speller_file: str, shift: int, length: int) \
-            -> list[dict[str, list[list[float]] | bool]]:
-        bci_log: list[BciRecord] = self._read_bci_log(bci_file=bci_file)
-        speller_log: list[SpellerRecord] = LogMerger._read_speller_records(speller_file=speller_file)
+    @staticmethod
+    def _find_window_starts(bci_log: BciLog, timestamps: np.ndarray, shift: int) -> np.ndarray:
+        start_positions: np.ndarray = np.searchsorted(bci_log.timestamps, timestamps)
+        if np.any(start_positions == len(bci_log)):
+            raise ValueError(
+                'The bci log period and the speller log period do not overlap'
+            )
+        # shift - в миллисекундах, временные метки - в микросекундах
+        shifted_positions: np.ndarray = np.searchsorted(bci_log.timestamps,
+                                                        bci_log.timestamps[start_positions] + shift * 1000)
+        if np.any(shifted_positions == len(bci_log)):
+            raise ValueError(
+                'The bci log period and the speller log period do not overlap'
+            )
+        return shifted_positions
+
+
+    @staticmethod
+    def _get_epochs(bci_log: BciLog, speller_log: SpellerLog, shift: int, length: int) -> SessionEpochs:
+        window_starts: np.ndarray = LogMerger._find_window_starts(bci_log=bci_log, timestamps=speller_log.timestamps,
+                                                                  shift=shift)
+        if len(window_starts) and window_starts.max() + length > len(bci_log):
+            raise ValueError(
+                'The bci log ends before the end of the last window'
+            )
+        # (n_events, length) индексов -> (n_events, length, n_channels) за одну операцию
+        indices: np.ndarray = window_starts[:, np.newaxis] + np.arange(length)
+        return SessionEpochs(
+            epochs=bci_log.values[indices],
+            is_correct=speller_log.is_correct,
+            channels=bci_log.channels
+        )
+
+
+    def _load_cached_speller_log(self, speller_file: str) -> SpellerLog:
+        with self.timings.measure('parse'):
+            if self.cache is None:
+                return LogMerger._load_speller_log(speller_file=speller_file)
+            arrays: dict[str, np.ndarray] = self.cache.get_or_parse(
+                path=speller_file,
+                kind='speller',
+                parse=lambda: vars(LogMerger._load_speller_log(speller_file=speller_file))
+            )
+        return SpellerLog(timestamps=arrays['timestamps'], is_correct=arrays['is_correct'])
+
+
+    def _prepare_bci_log(self, bci_file: str) -> tuple[BciLog, SamplingInfo, ClockCorrection | None]:
+        with self.timings.measure('parse'):
+            bci_log: BciLog = self._load_bci_log(bci_file=bci_file)
+        clock_correction: ClockCorrection | None = None
+        if self.clock_aligner is not None:
+            bci_log, clock_correction = self.clock_aligner.align(bci_log=bci_log, bci_file=bci_file)
+        # Пропуски ищутся до передискретизации, которая заполнила бы их интерполяцией
+        sampling_info: SamplingInfo = SamplingInfo.from_timestamps(timestamps=bci_log.timestamps,
+                                                                   gap_tolerance=self.gap_tolerance)
+        if self.sampling_rate is not None:
+            bci_log = resample(bci_log=bci_log, sampling_rate=self.sampling_rate)
+        if self.preprocessor is not None:
+            bci_log = self.preprocessor.apply(bci_log)
+        return bci_log, sampling_info, clock_correction
+
+
+    def _output_sampling_rate(self) -> float | None:
+        """Общая частота записей в окнах (с учётом прореживания), None - своя у каждой сессии"""
+        if self.sampling_rate is None:
+            return None
+        return self.sampling_rate / (self.preprocessor.decimation if self.preprocessor is not None else 1)
+
+
+    def _window_length(self, bci_log: BciLog, length: int | None, duration: int | None) -> int:
+        if length is not None:
+            return length
+        sampling_rate: float | None = self._output_sampling_rate()
+        if sampling_rate is None:
+            sampling_rate = estimate_sampling_rate(bci_log.timestamps)
+        return duration_to_records(duration=duration, sampling_rate=sampling_rate)
+
+
+    def _report_session(self, bci_log: BciLog, sampling_info: SamplingInfo,
+                        clock_correction: ClockCorrection | None, speller_log: SpellerLog, shift: int, length: int,
+                        bci_file: str, speller_file: str) \
+            -> tuple[SessionReport, np.ndarray]:
+        report, _, valid = check_windows(
+            bci_log=bci_log, timestamps=speller_log.timestamps, is_correct=speller_log.is_correct, shift=shift,
+            length=length, sampling_info=sampling_info, bci_file=bci_file, speller_file=speller_file,
+            baseline=self.preprocessor.baseline_records(bci_log) if self.preprocessor is not None else 0
+        )
+        report.device = self._get_bci_log_builder(bci_file=bci_file).device.name
+        if clock_correction is not None:
+            report.clock_correction = round(clock_correction.offset, 3)
+            report.clock_drift = round(clock_correction.drift, 3)
+            report.clock_discrepancy = round(clock_correction.end_discrepancy, 3)
+        return report, valid
+
+
+    def _check_session(self, bci_log: BciLog, sampling_info: SamplingInfo, clock_correction: ClockCorrection | None,
+                       speller_log: SpellerLog, shift: int, length: int, bci_file: str, speller_file: str) \
+            -> tuple[SessionReport, np.ndarray]:
+        """Отчёт по сессии и маска стимулов, окна которых можно вырезать"""
+        report, valid = self._report_session(
+            bci_log=bci_log, sampling_info=sampling_info, clock_correction=clock_correction, speller_log=speller_log,
+            shift=shift, length=length, bci_file=bci_file, speller_file=speller_file
+        )
+        if self.on_error == 'raise' and not report.ok:
+            raise ValueError(
+                f'{bci_file}, {speller_file}: ' + '; '.join(report.problems())
+            )
+        return report, valid
+
+
+    @staticmethod
+    def _select_events(speller_log: SpellerLog, valid: np.ndarray) -> SpellerLog:
+        if valid.all():
+            return speller_log
+        return SpellerLog(timestamps=speller_log.timestamps[valid], is_correct=speller_log.is_correct[valid])
+
+
+    def _baseline_offsets(self, bci_log: BciLog, speller_log: SpellerLog) -> np.ndarray | None:
+        if self.preprocessor is None:
+            return None
+        return self.preprocessor.baseline_offsets(bci_log=bci_log, timestamps=speller_log.timestamps)
+
+
+    def _epoch_session(self, bci_file: str, speller_file: str, shift: int, length: int | None = None,
+                       duration: int | None = None) -> SessionEpochs:
+        bci_log, sampling_info, clock_correction = self._prepare_bci_log(bci_file=bci_file)
+        speller_log: SpellerLog = self._load_cached_speller_log(speller_file=speller_file)
+        length = self._window_length(bci_log=bci_log, length=length, duration=duration)
+        report, valid = self._check_session(bci_log=bci_log, sampling_info=sampling_info,
+                                            clock_correction=clock_correction, speller_log=speller_log, shift=shift,
+                                            length=length, bci_file=bci_file, speller_file=speller_file)
+        speller_log = LogMerger._select_events(speller_log=speller_log, valid=valid)
+        session: SessionEpochs = LogMerger._get_epochs(bci_log=bci_log, speller_log=speller_log, shift=shift,
+                                                       length=length)
+        baseline_offsets: np.ndarray | None = self._baseline_offsets(bci_log=bci_log, speller_log=speller_log)
+        if baseline_offsets is not None:
+            session.epochs -= baseline_offsets
+        session.metadata = report.to_dict()
+        return session
+
+
+    def _validate_session(self, bci_file: str, speller_file: str, shift: int, length: int | None = None,
+                          duration: int | None = None) -> SessionReport:
+        try:
+            bci_log, sampling_info, clock_correction = self._prepare_bci_log(bci_file=bci_file)
+            speller_log: SpellerLog = self._load_cached_speller_log(speller_file=speller_file)
+        except (OSError, ValueError) as error:
+            return SessionReport.failed(bci_file=bci_file, speller_file=speller_file, error=error)
+        report, _ = self._report_session(
+            bci_log=bci_log, sampling_info=sampling_info, clock_correction=clock_correction, speller_log=speller_log,
+            shift=shift, length=self._window_length(bci_log=bci_log, length=length, duration=duration),
+            bci_file=bci_file, speller_file=speller_file
+        )
+        return report
+
+
+    def _sweep_session(self, bci_file: str, speller_file: str, shifts: list[int], lengths: list[int] | None = None,
+                       durations: list[int] | None = None) -> dict[tuple[int, int], SessionEpochs]:
+        """
+        Окна сессии для всех сочетаний shift и length (или duration - тогда длина окна в записях
+        определяется по частоте записей сессии, как в merge_logs()), ключи - (shift, length или duration).
+        Для каждого стимула один раз вырезается самое широкое окно, покрывающее все сочетания,
+        а окна отдельных сочетаний - его срезы (представления без копирования, если смещение
+        сдвига относительно начала широкого окна одинаково для всех стимулов).
+        Стимул отбрасывается во всех сочетаниях, если его окно не годится хотя бы для одного из них.
+        """
+        bci_log, sampling_info, clock_correction = self._prepare_bci_log(bci_file=bci_file)
+        speller_log: SpellerLog = self._load_cached_speller_log(speller_file=speller_file)
+        window_lengths: dict[int, int] = (
+            {length: length for length in lengths} if lengths is not None else
+            {duration: self._window_length(bci_log=bci_log, length=None, duration=duration) for duration in durations}
+        )
+        max_length: int = max(window_lengths.values())
+        reports: dict[int, SessionReport] = {}
+        valid: np.ndarray = np.ones(len(speller_log), dtype=bool)
+        for shift in shifts:
+            reports[shift], shift_valid = self._check_session(
+                bci_log=bci_log, sampling_info=sampling_info, clock_correction=clock_correction,
+                speller_log=speller_log, shift=shift, length=max_length, bci_file=bci_file, speller_file=speller_file
+            )
+            valid &= shift_valid
+        speller_log = LogMerger._select_events(speller_log=speller_log, valid=valid)
+        for shift in shifts:
+            reports[shift].targets = int(speller_log.is_correct.sum())
+            reports[shift].non_targets = len(speller_log) - reports[shift].targets
+
+        window_starts: dict[int, np.ndarray] = {
+            shift: LogMerger._find_window_starts(bci_log=bci_log, timestamps=speller_log.timestamps, shift=shift)
+            for shift in shifts
+        }
+
+        base_starts: np.ndarray = window_starts[min(shifts)]
+        offsets: dict[int, np.ndarray] = {shift: window_starts[shift] - base_starts for shift in shifts}
+        width: int = max(int(offset.max(initial=0)) for offset in offsets.values()) + max_length
+        indices: np.ndarray = np.minimum(base_starts[:, np.newaxis] + np.arange(width), len(bci_log) - 1)
+        buffer: np.ndarray = bci_log.values[indices]  # (n_events, width, n_channels)
+        baseline_offsets: np.ndarray | None = self._baseline_offsets(bci_log=bci_log, speller_log=speller_log)
+        if baseline_offsets is not None:
+            # Базовая линия одна для всех сочетаний, поэтому вычитается из широкого окна один раз
+            buffer -= baseline_offsets
+
+        result: dict[tuple[int, int], SessionEpochs] = {}
+        for shift in shifts:
+            offset: np.ndarray = offsets[shift]
+            uniform: bool = len(offset) == 0 or bool(np.all(offset == offset[0]))
+            for window, length in window_lengths.items():
+                if uniform:
+                    first: int = int(offset[0]) if len(offset) else 0
+                    epochs: np.ndarray = buffer[:, first:first + length]
+                else:
+                    epochs = np.take_along_axis(
+                        buffer, (offset[:, np.newaxis] + np.arange(length))[:, :, np.newaxis], axis=1
+                    )
+                result[(shift, window)] = SessionEpochs(
+                    epochs=epochs,
+                    is_correct=speller_log.is_correct,
+                    channels=bci_log.channels,
+                    metadata=reports[shift].to_dict()
+                )
+        return result
+
+
+    def _combine_session_logs(self, bci_file: str, speller_file: str, shift: int, length: int | None = None,
+                              duration: int | None = None) -> list[dict[str, list[list[float]] | bool]]:
+        if self.columnar and self.batched:
+            return self._epoch_session(
+                bci_file=bci_file, speller_file=speller_file, shift=shift, length=length, duration=duration
+            ).to_datapoints()
+
+        with self.timings.measure('parse'):
+            bci_log: BciLog | list[BciRecord] = (
+                self._load_bci_log(bci_file=bci_file) if self.columnar else self._read_bci_log(bci_file=bci_file)
+            )
+            speller_log: list[SpellerRecord] = LogMerger._read_speller_records(speller_file=speller_file)
         return [
             LogMerger._get_datapoint(bci_log=bci_log, speller_record=speller_record, shift=shift, length=length)
             for speller_record in speller_log
     ]
 
 
-    def merge_logs(self, log_files: list[tuple[str, str]], output_file: str, shift: int, length: int, desc: str) -> None:
-        unified_log: list[dict[str, list[list[float]] | bool]] = []
-        for log_pair in log_files:
-            single_session_combined_log: list[dict[str, list[list[float]] | bool]] = self._combine_session_logs(
-                bci_file=log_pair[0],
-                speller_file=log_pair[1],
-                shift=shift,
-                length=length
+    def _iter_sessions(self, log_files: list[tuple[str, str]], workers: int = 1, combine: Callable | None = None,
+                       **params) -> Iterator[tuple[tuple[str, str], Any]]:
+        """
+        Обрабатывает сессии (при workers > 1 - в пуле процессов) и отдаёт результаты в порядке log_files.
+        combine(bci_file=..., speller_file=..., **params) - обработка одной сессии,
+        по умолчанию - вырезание окон для merge_logs().
+        """
+        if combine is None:
+            combine = self._epoch_session if self.columnar and self.batched else self._combine_session_logs
+        if workers <= 1:
+            for log_pair in log_files:
+                yield log_pair, self._run_combine(combine, bci_file=log_pair[0], speller_file=log_pair[1], **params)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Ограничиваем число сессий в работе, чтобы готовые результаты не копились в памяти
+            pending: deque[tuple[tuple[str, str], Future]] = deque()
+            for log_pair in log_files:
+                pending.append((log_pair, executor.submit(
+                    self._combine_in_worker, combine, bci_file=log_pair[0], speller_file=log_pair[1], **params
+                )))
+                if len(pending) >= 2 * workers:
+                    done_pair, future = pending.popleft()
+                    yield done_pair, self._collect_worker_result(future.result())
+            while pending:
+                done_pair, future = pending.popleft()
+                yield done_pair, self._collect_worker_result(future.result())
+
+
+    def _combine_in_worker(self, combine: Callable, bci_file: str, speller_file: str, **params) \
+            -> tuple[Any, CacheStats | None, StageTimings]:
+        """Выполняется в дочернем процессе; статистика кэша и время этапов возвращаются вместе с результатом"""
+        if self.cache is not None:
+            self.cache.stats = CacheStats()
+        self.timings = StageTimings()
+        result = self._run_combine(combine, bci_file=bci_file, speller_file=speller_file, **params)
+        return result, self.cache.stats if self.cache is not None else None, self.timings
+
+
+    def _run_combine(self, combine: Callable, bci_file: str, speller_file: str, **params) -> Any:
+        """При on_error='skip' сессия, которую не удалось обработать, заменяется отчётом об ошибке"""
+        parse_seconds: float = self.timings.parse
+        started: float = time.perf_counter()
+        try:
+            if self.on_error == 'raise':
+                return combine(bci_file=bci_file, speller_file=speller_file, **params)
+            try:
+                return combine(bci_file=bci_file, speller_file=speller_file, **params)
+            except (OSError, ValueError) as error:
+                return SessionReport.failed(bci_file=bci_file, speller_file=speller_file, error=error)
+        finally:
+            # Разбор логов учтён в parse, остальное время обработки сессии - epoch
+            self.timings.epoch += time.perf_counter() - started - (self.timings.parse - parse_seconds)
+            self.timings.sessions += 1
+
+
+    def _collect_worker_result(self, worker_result: tuple[Any, CacheStats | None, StageTimings]) -> Any:
+        result, cache_stats, timings = worker_result
+        if cache_stats is not None:
+            self.cache.stats.update(cache_stats)
+        self.timings.update(timings)
+        return result
+
+
+    def _dataset_channels(self, log_files: list[tuple[str, str]], output_format: str) -> list[str]:
+        """Каналы датасета; при определении устройств по заголовкам читаются только заголовки логов"""
+        if self.bci_log_builder is not None:
+            return self.bci_log_builder.get_channels()
+        layouts: list[list[str]] = []
+        for bci_file, _ in log_files:
+            try:
+                channels: list[str] = BciLogBuilder.for_file(bci_file=bci_file).get_channels()
+            except (OSError, ValueError):
+                continue  # ошибка проявится при обработке сессии (on_error)
+            if channels not in layouts:
+                layouts.append(channels)
+        if len(layouts) > 1 and not issubclass(DATASET_WRITERS[output_format], TextDatasetWriter):
+            raise ValueError(
+                'The BCI logs were recorded by devices with different channels, '
+                'they can be merged only into a text output format'
+            )
+        # Для сессий с разными каналами каналы указаны устройством в отчёте каждой сессии
+        return layouts[0] if len(layouts) == 1 else []
+
+
+    def _open_writer(self, output_format: str, output_file: str, desc: str, shift: int, length: int,
+                     channels: list[str], duration: int | None = None) -> DatasetWriter:
+        return DATASET_WRITERS[output_format](
+            output_file=output_file,
+            desc=desc,
+            shift=shift,
+            length=length,
+            channels=channels,
+            dtype=self.dtype,
+            preprocessing=self.preprocessor.params() if self.preprocessor is not None else None,
+            duration=duration,
+            sampling_rate=self._output_sampling_rate()
+        )
+
+
+    def _enter_writer(self, stack: ExitStack, **params) -> DatasetWriter:
+        """
+        Открывает writer (см. _open_writer()) и закрывает его при выходе из stack, оба шага - этап serialize.
+        При выходе по исключению writer помечает датасет неполным (см. DatasetWriter.__exit__())
+        """
+        with self.timings.measure('serialize'):
+            writer: DatasetWriter = self._open_writer(**params)
+        stack.push(functools.partial(self._close_writer, writer))
+        return writer
+
+
+    def _close_writer(self, writer: DatasetWriter, exc_type, exc_value, traceback) -> None:
+        with self.timings.measure('serialize'):
+            writer.__exit__(exc_type, exc_value, traceback)
+
+
+    def merge_logs(self, log_files: list[tuple[str, str]], output_file: str, shift: int, length: int | None = None,
+                   desc: str = '', output_format: str = 'json', workers: int = 1, duration: int | None = None) \
+            -> list[SessionReport]:
+        if output_format not in DATASET_WRITERS:
+            raise ValueError(
+                f'Unknown output format "{output_format}", expected one of: {", ".join(DATASET_WRITERS)}'
+            )
+        if (length is None) == (duration is None):
+            raise ValueError(
+                'Exactly one of length and duration must be given'
+            )
+        if not issubclass(DATASET_WRITERS[output_format], TextDatasetWriter) and not (self.columnar and self.batched):
+            raise ValueError(
+                'Binary output formats require columnar batched epoching'
+            )
+        if (self.preprocessor is not None or self.sampling_rate is not None or duration is not None) \
+                and not (self.columnar and self.batched):
+            raise ValueError(
+                'Preprocessing, resampling and time-based windows require columnar batched epoching'
             )
-            unified_log.extend(single_session_combined_log)
 
-        result = {
-            'desc': desc,
-            'data': list(unified_log)
-        }
+        channels: list[str] = self._dataset_channels(log_files=log_files, output_format=output_format)
+        window_length: int | None = length
+        if window_length is None and self._output_sampling_rate() is not None:
+            window_length = duration_to_records(duration=duration, sampling_rate=self._output_sampling_rate())
+
+        reports: list[SessionReport] = []
+        # Каждая сессия сразу уходит в writer, в памяти одновременно держится не больше одной сессии
+        # (при workers > 1 - не больше 2 * workers)
+        with ExitStack() as stack:
+            writer: DatasetWriter | None = None
+
+            def open_writer(window_length: int) -> DatasetWriter:
+                opened: DatasetWriter = self._enter_writer(
+                    stack=stack, output_format=output_format, output_file=output_file, desc=desc, shift=shift,
+                    length=window_length, channels=channels, duration=duration
+                )
+                # До открытия writer могли встретиться только пропущенные сессии
+                for skipped in reports:
+                    opened.skip_session(report=skipped.to_dict())
+                return opened
+
+            # Если длина окна зависит от частоты сессий, writer открывается по первой сессии
+            if window_length is not None:
+                writer = open_writer(window_length)
+            for log_pair, session in self._iter_sessions(log_files=log_files, workers=workers, shift=shift,
+                                                         length=length, duration=duration):
+                if isinstance(session, SessionReport):
+                    if writer is not None:
+                        writer.skip_session(report=session.to_dict())
+                    reports.append(session)
+                    continue
+                if writer is None:
+                    writer = open_writer(session.epochs.shape[1])
+                if isinstance(session, SessionEpochs):
+                    with self.timings.measure('serialize'):
+                        writer.write_session(session=session, bci_file=log_pair[0], speller_file=log_pair[1])
+                    reports.append(SessionReport(**session.metadata))
+                else:
+                    with self.timings.measure('serialize'):
+                        writer.write_datapoints(datapoints=session, bci_file=log_pair[0], speller_file=log_pair[1])
+                    targets: int = sum(datapoint['is_correct'] for datapoint in session)
+                    reports.append(SessionReport(bci_file=log_pair[0], speller_file=log_pair[1], events=len(session),
+                                                 targets=targets, non_targets=len(session) - targets))
+            if writer is None:
+                open_writer(0)
+        return reports
+
+
+    def validate(self, log_files: list[tuple[str, str]], shift: int, length: int | None = None,
+                 duration: int | None = None, workers: int = 1) -> list[SessionReport]:
+        """Проверка всех сессий без вырезания окон - быстрее, чем дождаться ошибки в merge_logs()"""
+        if (length is None) == (duration is None):
+            raise ValueError(
+                'Exactly one of length and duration must be given'
+            )
+        return [
+            report for _, report in self._iter_sessions(log_files=log_files, workers=workers,
+                                                         combine=self._validate_session, shift=shift, length=length,
+                                                         duration=duration)
+        ]
 
-        with open(output_file, 'w') as fp:
-            json.dump(result, fp)
 
+    @staticmethod
+    def _sweep_windows(lengths: list[int] | None, durations: list[int] | None) -> list[int]:
+        if (lengths is None) == (durations is None):
+            raise ValueError(
+                'Exactly one of lengths and durations must be given'
+            )
+        return lengths if lengths is not None else durations
 
-if __name__ == '__main__':
-    log_files: list[tuple[str, str]] = [
-        (f'bci_logs/l4_{str(i).zfill(2)}.csv', f'speller_logs/l4_{str(i).zfill(2)}.csv')
-        for i in range(1, 17)
-    ]
 
-    output_file: str = 'merged_log_emotiv_v3.json'
-
-    shift_milliseconds: int = 200  # Параметр для изменения
-    duration_milliseconds: int = 300  # Параметр для изменения
-    bci_records_per_second: int = 128
-    length_records: int = bci_records_per_second * duration_milliseconds // 1000
-
-    desc: str = f"""Все данные, собранные 2024-11-09, кроме 16-й сессии.
-Параметры bci: emotiv.
-Параметры спеллера: speller v3, interval=200, interval_between_symbols=5000, interval_highlight=100.
-Параметры объединения: shift={shift_milliseconds} мс, length={length_records} записей ({duration_milliseconds} мс)."""
-
-    bci_log_builder: BciLogBuilder = EmotivLogBuilder()
-    log_merger: LogMerger = LogMerger(bci_log_builder=bci_log_builder)
-    log_merger.merge_logs(
-        log_files=log_files,
-        output_file=output_file,
-        shift=shift_milliseconds,
-        length=length_records,
-        desc=desc
-    )
+    def sweep(self, log_files: list[tuple[str, str]], shifts: list[int], lengths: list[int] | None = None,
+              durations: list[int] | None = None, workers: int = 1) -> dict[tuple[int, int], list[SessionEpochs]]:
+        """
+        Окна всех сессий для каждого сочетания (shift, length) или (shift, duration) за один проход по данным.
+        Задаётся ровно один из lengths (записи) и durations (мс)
+        """
+        result: dict[tuple[int, int], list[SessionEpochs]] = {
+            (shift, window): [] for shift in shifts for window in LogMerger._sweep_windows(lengths, durations)
+        }
+        for _, session_sweep in self._iter_sessions(log_files=log_files, workers=workers, combine=self._sweep_session,
+                                                    shifts=shifts, lengths=lengths, durations=durations):
+            if isinstance(session_sweep, SessionReport):
+                continue
+            for parameters, session in session_sweep.items():
+                result[parameters].append(session)
+        return result
+
+
+    def sweep_logs(self, log_files: list[tuple[str, str]], output_file: str, shifts: list[int],
+                   lengths: list[int] | None = None, desc: str = '', output_format: str = 'npy', workers: int = 1,
+                   durations: list[int] | None = None) -> None:
+        """
+        То же, что merge_logs() для каждого сочетания (shift, length) или (shift, duration), но каждая сессия
+        читается один раз. output_file - шаблон пути с полями {shift} и {length} (или {duration}),
+        например 'merged_{shift}_{duration}.npy'
+        """
+        if output_format not in DATASET_WRITERS:
+            raise ValueError(
+                f'Unknown output format "{output_format}", expected one of: {", ".join(DATASET_WRITERS)}'
+            )
+        windows: list[int] = LogMerger._sweep_windows(lengths, durations)
+        window_field: str = 'length' if lengths is not None else 'duration'
+
+        channels: list[str] = self._dataset_channels(log_files=log_files, output_format=output_format)
+        with ExitStack() as stack:
+            writers: dict[tuple[int, int], DatasetWriter] = {}
+            skipped: list[dict] = []
+
+            def open_writer(shift: int, window: int, length: int) -> DatasetWriter:
+                opened: DatasetWriter = self._enter_writer(
+                    stack=stack,
+                    output_format=output_format,
+                    output_file=output_file.format(shift=shift, **{window_field: window}),
+                    desc=desc,
+                    shift=shift,
+                    length=length,
+                    channels=channels,
+                    duration=window if durations is not None else None
+                )
+                # До открытия writer могли встретиться только пропущенные сессии
+                for report in skipped:
+                    opened.skip_session(report=report)
+                return opened
+
+            # Если длина окна зависит от частоты сессий, writers открываются по первой сессии
+            if lengths is not None or self._output_sampling_rate() is not None:
+                for shift in shifts:
+                    for window in windows:
+                        writers[(shift, window)] = open_writer(shift, window, window if lengths is not None else (
+                            duration_to_records(duration=window, sampling_rate=self._output_sampling_rate())
+                        ))
+            for log_pair, session_sweep in self._iter_sessions(log_files=log_files, workers=workers,
+                                                               combine=self._sweep_session, shifts=shifts,
+                                                               lengths=lengths, durations=durations):
+                if isinstance(session_sweep, SessionReport):
+                    for writer in writers.values():
+                        writer.skip_session(report=session_sweep.to_dict())
+                    skipped.append(session_sweep.to_dict())
+                    continue
+                with self.timings.measure('serialize'):
+                    for parameters, session in session_sweep.items():
+                        if parameters not in writers:
+                            writers[parameters] = open_writer(*parameters, length=session.epochs.shape[1])
+                        writers[parameters].write_session(session=session, bci_file=log_pair[0],
+                                                          speller_file=log_pair[1])
+            for shift in shifts:
+                for window in windows:
+                    if (shift, window) not in writers:
+                        open_writer(shift, window, 0)
@@ -0,0 +1,78 @@
+"""
+Предобработка сигнала BCI перед вырезанием окон.
+
+Фильтрация и прореживание применяются один раз ко всему логу сессии (а не к каждому окну),
+поэтому на краях окон нет переходных процессов фильтра. Фильтры - с нулевой фазой
+(прямой и обратный проход), чтобы не сдвигать ответ относительно стимула.
+Коррекция базовой линии вычитает из каждого окна среднее по записям перед стимулом.
+
+Для фильтрации и прореживания нужен scipy, он импортируется только при их использовании.
+"""
+
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from bci_data import BciLog
+from log_merger.sampling import estimate_sampling_rate
+
+
+@dataclass
+class Preprocessor:
+    band: tuple[float, float] | None = None  # Гц, полоса пропускания; None - без полосового фильтра
+    notch: float | None = None  # Гц, частота режекторного фильтра (сетевая наводка); None - без него
+    notch_quality: float = 30.0
+    order: int = 4  # порядок полосового фильтра Баттерворта
+    decimation: int = 1  # во сколько раз проредить запись
+    baseline: int = 0  # мс перед стимулом для коррекции базовой линии; 0 - без коррекции
+
+    def params(self) -> dict:
+        """Параметры для метаданных датасета"""
+        return asdict(self)
+
+    def apply(self, bci_log: BciLog) -> BciLog:
+        """Фильтрация и прореживание всего лога сессии"""
+        if self.band is None and self.notch is None and self.decimation == 1:
+            return bci_log
+        from scipy import signal
+
+        sampling_rate: float = estimate_sampling_rate(bci_log.timestamps)
+        values: np.ndarray = bci_log.values
+        sections: list[np.ndarray] = []
+        if self.band is not None:
+            sections.append(signal.butter(self.order, self.band, btype='bandpass', fs=sampling_rate, output='sos'))
+        if self.notch is not None:
+            sections.append(signal.tf2sos(*signal.iirnotch(self.notch, self.notch_quality, fs=sampling_rate)))
+        if sections:
+            values = signal.sosfiltfilt(np.concatenate(sections), values, axis=0)
+
+        timestamps: np.ndarray = bci_log.timestamps
+        if self.decimation > 1:
+            # decimate() сам подавляет частоты выше новой частоты Найквиста, тоже с нулевой фазой
+            values = signal.decimate(values, self.decimation, ftype='iir', axis=0, zero_phase=True)
+            timestamps = timestamps[::self.decimation]
+
+        return BciLog(
+            timestamps=timestamps,
+            values=values.astype(bci_log.values.dtype, copy=False),
+            channels=bci_log.channels
+        )
+
+    def baseline_records(self, bci_log: BciLog) -> int:
+        """Число записей базовой линии в логе сессии; 0 - если коррекция отключена"""
+        if not self.baseline:
+            return 0
+        return max(1, round(self.baseline * estimate_sampling_rate(bci_log.timestamps) / 1000))
+
+    def baseline_offsets(self, bci_log: BciLog, timestamps: np.ndarray) -> np.ndarray | None:
+        """
+        Среднее по каждому каналу за baseline мс перед каждым стимулом, (n_events, 1, n_channels) -
+        вычитается из окон. None - если коррекция отключена.
+        Стимулы, перед которыми базовой линии нет, заранее отбрасывает check_windows() (см. validation.py).
+        """
+        if not self.baseline:
+            return None
+        records: int = self.baseline_records(bci_log)
+        stimulus_positions: np.ndarray = np.searchsorted(bci_log.timestamps, timestamps)
+        indices: np.ndarray = stimulus_positions[:, np.newaxis] - np.arange(records, 0, -1)
+        return bci_log.values[indices].mean(axis=1, keepdims=True)
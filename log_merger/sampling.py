@@ -0,0 +1,78 @@
+"""
+Частота записей BCI, пропуски в логе и передискретизация.
+
+Частота определяется по временным меткам каждой сессии (устройства пишут с разной частотой,
+и номинальная частота не всегда совпадает с фактической). Пропуск - интервал между соседними
+записями больше gap_tolerance медианных интервалов; окна, захватывающие пропуск, не годятся
+для обучения.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from bci_data import BciLog
+
+
+def estimate_sampling_rate(timestamps: np.ndarray) -> float:
+    """Частота записей (Гц) по медианному интервалу между временными метками (в микросекундах)"""
+    if len(timestamps) < 2:
+        raise ValueError(
+            'At least two records are required to estimate the sampling rate'
+        )
+    return 1_000_000 / float(np.median(np.diff(timestamps)))
+
+
+def duration_to_records(duration: int, sampling_rate: float) -> int:
+    """Число записей в окне длительностью duration мс"""
+    return max(1, round(duration * sampling_rate / 1000))
+
+
+@dataclass
+class SamplingInfo:
+    sampling_rate: float  # Гц
+    gap_starts: np.ndarray  # int64, временные метки последних записей перед пропусками
+    gap_ends: np.ndarray  # int64, временные метки первых записей после пропусков
+    dropped_samples: int  # сколько записей пропущено по оценке
+
+    @staticmethod
+    def from_timestamps(timestamps: np.ndarray, gap_tolerance: float = 1.5) -> 'SamplingInfo':
+        sampling_rate: float = estimate_sampling_rate(timestamps)
+        intervals: np.ndarray = np.diff(timestamps)
+        period: float = 1_000_000 / sampling_rate
+        gaps: np.ndarray = np.flatnonzero(intervals > gap_tolerance * period)
+        return SamplingInfo(
+            sampling_rate=sampling_rate,
+            gap_starts=timestamps[gaps],
+            gap_ends=timestamps[gaps + 1],
+            dropped_samples=int(np.sum(np.round(intervals[gaps] / period)) - len(gaps))
+        )
+
+    def crosses_gap(self, window_starts: np.ndarray, window_ends: np.ndarray) -> np.ndarray:
+        """Маска окон [window_starts, window_ends] (временные метки), захватывающих пропуск"""
+        if not len(self.gap_starts):
+            return np.zeros(len(window_starts), dtype=bool)
+        # Пропуски упорядочены и не пересекаются, поэтому достаточно проверить первый пропуск,
+        # который заканчивается после начала окна
+        first_gap: np.ndarray = np.searchsorted(self.gap_ends, window_starts, side='right')
+        crosses: np.ndarray = first_gap < len(self.gap_starts)
+        crosses[crosses] = self.gap_starts[first_gap[crosses]] < window_ends[crosses]
+        return crosses
+
+
+def resample(bci_log: BciLog, sampling_rate: float) -> BciLog:
+    """
+    Линейная интерполяция лога на равномерную сетку с частотой sampling_rate (Гц)
+    от первой до последней записи - для всех каналов сразу.
+    """
+    timestamps: np.ndarray = bci_log.timestamps
+    period: float = 1_000_000 / sampling_rate
+    n_records: int = int((timestamps[-1] - timestamps[0]) // period) + 1
+    grid: np.ndarray = timestamps[0] + np.round(np.arange(n_records) * period).astype(np.int64)
+
+    right: np.ndarray = np.clip(np.searchsorted(timestamps, grid, side='right'), 1, len(timestamps) - 1)
+    left: np.ndarray = right - 1
+    weights: np.ndarray = (grid - timestamps[left]) / np.maximum(timestamps[right] - timestamps[left], 1)
+    weights = weights[:, np.newaxis].astype(bci_log.values.dtype)
+    values: np.ndarray = bci_log.values[left] * (1 - weights) + bci_log.values[right] * weights
+    return BciLog(timestamps=grid, values=values, channels=bci_log.channels)
@@ -0,0 +1,125 @@
+"""
+Дисковый кэш разобранных логов.
+
+Массивы, полученные из csv (временные метки, матрица каналов, метки спеллера), сохраняются в
+<directory>/<ключ>.npz. Ключ строится по абсолютному пути, размеру и mtime файла (или по sha1
+его содержимого при content_hash=True) и виду разбора (устройство BCI и dtype). При повторном
+объединении с другими shift/length csv не разбираются. Когда суммарный размер кэша превышает
+max_bytes, удаляются давно не использованные записи.
+"""
+
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import time
+from typing import Callable
+import zipfile
+
+import numpy as np
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    parse_seconds: float = 0.0  # время разбора csv при промахах
+    load_seconds: float = 0.0  # время чтения из кэша при попаданиях
+    saved_seconds: float = 0.0  # сколько занял бы разбор тех же файлов минус время чтения из кэша
+
+    def update(self, other: 'CacheStats') -> None:
+        self.hits += other.hits
+        self.misses += other.misses
+        self.parse_seconds += other.parse_seconds
+        self.load_seconds += other.load_seconds
+        self.saved_seconds += other.saved_seconds
+
+    def report(self) -> str:
+        return (
+            f'cache: {self.hits} hits, {self.misses} misses, '
+            f'parsing {self.parse_seconds:.2f} s, loading {self.load_seconds:.2f} s, '
+            f'saved {self.saved_seconds:.2f} s'
+        )
+
+
+class SessionCache:
+    def __init__(self, directory: str = '.log_merger_cache', max_bytes: int = 2 * 1024 ** 3,
+                 content_hash: bool = False) -> None:
+        self.directory: str = directory
+        self.max_bytes: int = max_bytes
+        self.content_hash: bool = content_hash  # True - ключ по содержимому, а не по mtime
+        self.stats: CacheStats = CacheStats()
+        os.makedirs(self.directory, exist_ok=True)
+        self._evict()
+
+    def _key(self, path: str, kind: str) -> str:
+        if self.content_hash:
+            file_hash = hashlib.sha1()
+            with open(path, 'rb') as fp:
+                for chunk in iter(lambda: fp.read(1 << 20), b''):
+                    file_hash.update(chunk)
+            identity: list = [file_hash.hexdigest()]
+        else:
+            stat: os.stat_result = os.stat(path)
+            identity = [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+        return hashlib.sha1(json.dumps(identity + [kind]).encode()).hexdigest()
+
+    def get_or_parse(self, path: str, kind: str, parse: Callable[[], dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+        entry_file: str = os.path.join(self.directory, self._key(path=path, kind=kind) + '.npz')
+
+        started: float = time.perf_counter()
+        try:
+            with np.load(entry_file) as entry:
+                arrays: dict[str, np.ndarray] = {name: entry[name] for name in entry.files}
+        except (OSError, ValueError, zipfile.BadZipFile):
+            arrays = {}
+        if arrays:
+            load_seconds: float = time.perf_counter() - started
+            os.utime(entry_file)  # mtime служит временем последнего использования для вытеснения
+            parse_seconds: float = float(arrays.pop('parse_seconds'))
+            self.stats.hits += 1
+            self.stats.load_seconds += load_seconds
+            self.stats.saved_seconds += parse_seconds - load_seconds
+            return arrays
+
+        started = time.perf_counter()
+        arrays = parse()
+        parse_seconds = time.perf_counter() - started
+        self.stats.misses += 1
+        self.stats.parse_seconds += parse_seconds
+        self._store(entry_file=entry_file, arrays=arrays, parse_seconds=parse_seconds)
+        return arrays
+
+    def _store(self, entry_file: str, arrays: dict[str, np.ndarray], parse_seconds: float) -> None:
+        # Запись через временный файл: кэш могут одновременно заполнять несколько процессов
+        temporary_file: str = f'{entry_file}.{os.getpid()}.tmp'
+        with open(temporary_file, 'wb') as fp:
+            np.savez(fp, parse_seconds=np.float64(parse_seconds), **arrays)
+        if os.path.getsize(temporary_file) > self.max_bytes:
+            os.remove(temporary_file)
+            return
+        os.replace(temporary_file, entry_file)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries: list[tuple[float, int, str]] = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npz'):
+                continue
+            try:
+                stat: os.stat_result = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total_bytes: int = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+    def report(self) -> str:
+        return self.stats.report()
@@ -0,0 +1,44 @@
+"""
+Время работы LogMerger по этапам.
+
+parse     - чтение и разбор логов BCI и спеллера (или их загрузка из кэша)
+epoch     - всё остальное время обработки сессии: выравнивание часов, передискретизация, фильтрация,
+            проверка сессии и вырезание окон
+serialize - открытие выходного файла, запись сессий и закрытие
+
+При workers > 1 parse и epoch выполняются в дочерних процессах и суммируются по ним,
+поэтому их сумма может быть больше времени объединения.
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+import time
+from typing import Iterator
+
+
+@dataclass
+class StageTimings:
+    parse: float = 0.0  # с
+    epoch: float = 0.0  # с
+    serialize: float = 0.0  # с
+    sessions: int = 0
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        started: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, stage, getattr(self, stage) + time.perf_counter() - started)
+
+    def update(self, other: 'StageTimings') -> None:
+        self.parse += other.parse
+        self.epoch += other.epoch
+        self.serialize += other.serialize
+        self.sessions += other.sessions
+
+    def report(self) -> str:
+        return (
+            f'timings: {self.sessions} sessions, parse {self.parse:.2f} s, epoch {self.epoch:.2f} s, '
+            f'serialize {self.serialize:.2f} s'
+        )
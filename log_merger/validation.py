@@ -0,0 +1,144 @@
+"""
+Проверка сессии перед вырезанием окон.
+
+Все стимулы сессии проверяются разом по временным меткам: попадает ли окно в запись BCI,
+помещается ли оно в лог целиком и не захватывает ли пропуск, а при коррекции базовой линии -
+записаны ли перед стимулом baseline записей без пропусков. Итог - SessionReport:
+смещение часов спеллера относительно BCI, доля перекрытия записей, пропуски, отброшенные окна
+и баланс классов. LogMerger(on_error='skip') отбрасывает негодные окна и сессии и продолжает
+объединение, а отчёты возвращает из merge_logs() и пишет в метаданные датасета.
+"""
+
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from bci_data import BciLog
+from log_merger.sampling import SamplingInfo
+
+
+@dataclass
+class SessionReport:
+    bci_file: str
+    speller_file: str
+    error: str | None = None  # сессия пропущена целиком
+    device: str | None = None  # устройство BCI (см. bci_data/devices.py)
+    sampling_rate: float = 0.0  # Гц
+    records: int = 0
+    events: int = 0
+    clock_offset: float = 0.0  # мс, начало лога спеллера относительно начала лога BCI
+    clock_correction: float = 0.0  # мс, поправка времени BCI при выравнивании часов (см. clock_alignment.py)
+    clock_drift: float = 0.0  # ppm, поправка хода часов BCI при выравнивании
+    clock_discrepancy: float = 0.0  # мс, расхождение конца лога BCI с номинальной частотой (NominalRateAligner)
+    overlap: float = 0.0  # доля периода лога спеллера, покрытая логом BCI
+    gaps: int = 0
+    dropped_samples: int = 0
+    out_of_range_epochs: int = 0  # стимул или начало окна вне записи BCI
+    truncated_epochs: int = 0  # окно не помещается в конец записи BCI
+    gap_epochs: int = 0  # окно захватывает пропуск
+    baseline_epochs: int = 0  # перед стимулом не хватает записей для базовой линии или она захватывает пропуск
+    targets: int = 0  # окна, попавшие в датасет
+    non_targets: int = 0
+
+    @property
+    def dropped_epochs(self) -> int:
+        return self.out_of_range_epochs + self.truncated_epochs + self.gap_epochs + self.baseline_epochs
+
+    @property
+    def ok(self) -> bool:
+        """Сессию можно объединить без потери окон (окна на пропусках отбрасываются всегда)"""
+        return (
+            self.error is None and not self.out_of_range_epochs and not self.truncated_epochs
+            and not self.baseline_epochs
+        )
+
+    def problems(self) -> list[str]:
+        problems: list[str] = []
+        if self.error is not None:
+            problems.append(self.error)
+        if self.out_of_range_epochs:
+            problems.append(
+                f'The bci log period and the speller log period do not overlap for {self.out_of_range_epochs} events'
+            )
+        if self.truncated_epochs:
+            problems.append(f'The bci log ends before the end of {self.truncated_epochs} windows')
+        if self.baseline_epochs:
+            problems.append(f'The baseline interval before {self.baseline_epochs} events is incomplete or has gaps')
+        return problems
+
+    def summary(self) -> str:
+        if self.error is not None:
+            return f'{self.bci_file}: skipped ({self.error})'
+        return (
+            f'{self.bci_file}: {self.targets + self.non_targets}/{self.events} epochs '
+            f'({self.targets} targets), {self.sampling_rate:.2f} Hz, clock offset {self.clock_offset:.0f} ms, '
+            f'overlap {self.overlap:.0%}, {self.gaps} gaps ({self.dropped_samples} samples), dropped: '
+            f'{self.out_of_range_epochs} out of range, {self.truncated_epochs} truncated, {self.gap_epochs} on gaps, '
+            f'{self.baseline_epochs} without baseline'
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @staticmethod
+    def failed(bci_file: str, speller_file: str, error: Exception) -> 'SessionReport':
+        return SessionReport(bci_file=bci_file, speller_file=speller_file, error=f'{type(error).__name__}: {error}')
+
+
+def check_windows(bci_log: BciLog, timestamps: np.ndarray, is_correct: np.ndarray, shift: int, length: int,
+                  sampling_info: SamplingInfo, bci_file: str, speller_file: str, baseline: int = 0) \
+        -> tuple[SessionReport, np.ndarray, np.ndarray]:
+    """
+    Проверяет окна всех стимулов (timestamps, мкс) со сдвигом shift мс и длиной length записей,
+    а если baseline > 0 - и baseline записей перед каждым стимулом (базовая линия).
+    Возвращает отчёт, начала окон и маску окон, которые можно вырезать.
+    """
+    bci_timestamps: np.ndarray = bci_log.timestamps
+    n_records: int = len(bci_timestamps)
+    start_positions: np.ndarray = np.searchsorted(bci_timestamps, timestamps)
+    out_of_range: np.ndarray = (timestamps < bci_timestamps[0]) | (start_positions == n_records)
+    shifted_positions: np.ndarray = np.searchsorted(
+        bci_timestamps, bci_timestamps[np.minimum(start_positions, n_records - 1)] + shift * 1000
+    )
+    out_of_range |= shifted_positions == n_records
+    truncated: np.ndarray = ~out_of_range & (shifted_positions + length > n_records)
+
+    crosses_gap: np.ndarray = np.zeros(len(timestamps), dtype=bool)
+    fits: np.ndarray = ~out_of_range & ~truncated
+    crosses_gap[fits] = sampling_info.crosses_gap(
+        window_starts=bci_timestamps[shifted_positions[fits]],
+        window_ends=bci_timestamps[shifted_positions[fits] + length - 1]
+    )
+    valid: np.ndarray = fits & ~crosses_gap
+
+    # Базовая линия - записи [start_position - baseline, start_position), пропуск перед стимулом тоже не годится
+    no_baseline: np.ndarray = np.zeros(len(timestamps), dtype=bool)
+    if baseline:
+        no_baseline[valid] = start_positions[valid] < baseline
+        with_records: np.ndarray = valid & ~no_baseline
+        no_baseline[with_records] = sampling_info.crosses_gap(
+            window_starts=bci_timestamps[start_positions[with_records] - baseline],
+            window_ends=bci_timestamps[start_positions[with_records]]
+        )
+        valid &= ~no_baseline
+
+    speller_period: tuple[int, int] = (int(timestamps[0]), int(timestamps[-1])) if len(timestamps) else (0, 0)
+    covered: int = max(0, min(speller_period[1], int(bci_timestamps[-1])) - max(speller_period[0], int(bci_timestamps[0])))
+    report: SessionReport = SessionReport(
+        bci_file=bci_file,
+        speller_file=speller_file,
+        sampling_rate=round(sampling_info.sampling_rate, 3),
+        records=n_records,
+        events=len(timestamps),
+        clock_offset=(speller_period[0] - int(bci_timestamps[0])) / 1000,
+        overlap=covered / (speller_period[1] - speller_period[0]) if speller_period[1] > speller_period[0] else 1.0,
+        gaps=len(sampling_info.gap_starts),
+        dropped_samples=sampling_info.dropped_samples,
+        out_of_range_epochs=int(out_of_range.sum()),
+        truncated_epochs=int(truncated.sum()),
+        gap_epochs=int(crosses_gap.sum()),
+        baseline_epochs=int(no_baseline.sum()),
+        targets=int(np.sum(is_correct & valid)),
+        non_targets=int(np.sum(~is_correct & valid))
+    )
+    return report, shifted_positions, valid
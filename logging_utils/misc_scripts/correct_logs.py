@@ -0,0 +1,170 @@
+"""
+Corrects raw logs in bulk: emotiv bci logs (see correct_emotiv_logs_format.py)
+and speller logs with decimal timestamps (see correct_speller_logs_timestamp.py).
+
+Each file is processed in chunks of rows with vectorized column selection and timestamp
+generation, written to a temporary file next to it and atomically renamed over the original,
+so an interrupted run never leaves a half-written log. Files that are already corrected are
+detected by their header (or first record) and skipped, so the tool is safe to re-run on a
+whole directory. Files are processed in parallel.
+
+Usage:
+    python correct_logs.py emotiv bci_logs/*.csv --workers 4
+    python correct_logs.py speller speller_logs/*.csv
+"""
+
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import itertools
+import os
+from typing import Callable, Iterator, TextIO
+
+import numpy as np
+
+
+EMOTIV_HEADER: list[str] = [
+    "timestamp", "f3", "fc5", "af3", "f7", "t7", "p7", "o1", "o2", "p8", "t8", "f8", "af4", "fc6", "f4"
+]
+EMOTIV_COLUMNS: range = range(2, 16)  # columns of the 14 channels in the raw emotiv log
+SPELLER_HEADER: list[str] = ["timestamp", "row", "col", "correct"]
+CHUNK_SIZE: int = 65_536
+
+
+def _read_chunks(log: TextIO, chunk_size: int, usecols: range | tuple[int, ...]) -> Iterator[np.ndarray]:
+    """Rows of the csv as arrays of strings (chunk_size rows at a time)"""
+    while True:
+        lines: list[str] = list(itertools.islice(log, chunk_size))
+        if not lines:
+            return
+        yield np.loadtxt(lines, delimiter=',', quotechar='"', usecols=usecols, dtype=str, ndmin=2)
+
+
+def _write_row(log: TextIO, row: list[str]) -> None:
+    # Same line terminator as csv.writer, which wrote the logs before
+    log.write(','.join(row) + '\r\n')
+
+
+def _write_chunk(log: TextIO, columns: list[np.ndarray]) -> None:
+    rows: list[list[str]] = np.column_stack(columns).tolist()
+    log.write('\r\n'.join(map(','.join, rows)) + '\r\n')
+
+
+def _rewrite(log_file: str, correct: Callable[[TextIO, TextIO], None]) -> None:
+    """correct(source, target) writes the corrected log; the original is replaced only if it succeeds"""
+    temporary_file: str = f'{log_file}.{os.getpid()}.tmp'
+    try:
+        with open(log_file, newline='') as source, open(temporary_file, mode='w', newline='') as target:
+            correct(source, target)
+        os.replace(temporary_file, log_file)
+    finally:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+
+
+def _parse_emotiv_header(header: list[str]) -> tuple[int, float]:
+    if len(header) < 4 or header[2].split(':')[0].strip() != 'timestamp started':
+        raise ValueError(
+            '''This file doesn't have the starting timestamp at the expected place'''
+        )
+    timestamp_started: int = round(float(header[2].split(':')[1]))
+    if header[3].split(':')[0].strip() != 'sampling':
+        raise ValueError(
+            '''This file doesn't have the sampling rate at the expected place'''
+        )
+    sampling: float = float(header[3].split(':')[1])
+    return timestamp_started, sampling
+
+
+def is_emotiv_log_corrected(log_file: str) -> bool:
+    with open(log_file, newline='') as log:
+        return next(csv.reader([log.readline()]), []) == EMOTIV_HEADER
+
+
+def correct_emotiv_log(log_file: str, chunk_size: int = CHUNK_SIZE) -> bool:
+    """
+    Removes the emotiv metadata header and unnecessary columns (e.g. gyro) and adds a timestamp
+    to each record: timestamp_started + round(index * 1_000_000 / sampling), without the drift of
+    an integer time step. Returns False if the log is already corrected.
+    """
+    if is_emotiv_log_corrected(log_file):
+        return False
+
+    def correct(source: TextIO, target: TextIO) -> None:
+        timestamp_started, sampling = _parse_emotiv_header(next(csv.reader([source.readline()]), []))
+        _write_row(target, EMOTIV_HEADER)
+        written: int = 0
+        for values in _read_chunks(source, chunk_size=chunk_size, usecols=EMOTIV_COLUMNS):
+            indices: np.ndarray = written + np.arange(len(values))
+            timestamps: np.ndarray = timestamp_started + np.round(indices * (1_000_000 / sampling)).astype(np.int64)
+            _write_chunk(target, [timestamps.astype(str), values])
+            written += len(values)
+
+    _rewrite(log_file, correct)
+    return True
+
+
+def _check_speller_header(header: list[str]) -> None:
+    if header[:4] != SPELLER_HEADER:
+        raise ValueError(
+            '''The file with the gaze tracker log has wrong data formant.
+            It must have a header with "timestamp", "row", "col" and "correct",
+            separated by commas'''
+        )
+
+
+def is_speller_log_corrected(log_file: str) -> bool:
+    """Speller logs have the same header before and after correction, so the first record is checked"""
+    with open(log_file, newline='') as log:
+        _check_speller_header(next(csv.reader([log.readline()]), []))
+        first_record: list[str] = next(csv.reader([log.readline()]), [])
+    return not first_record or '.' not in first_record[0]
+
+
+def correct_speller_log(log_file: str, chunk_size: int = CHUNK_SIZE) -> bool:
+    """
+    Converts decimal timestamps (seconds) of the speller logs, written before the #e8df74 commit,
+    to integer microseconds. Returns False if the log is already corrected.
+    """
+    if is_speller_log_corrected(log_file):
+        return False
+
+    def correct(source: TextIO, target: TextIO) -> None:
+        _check_speller_header(next(csv.reader([source.readline()]), []))
+        _write_row(target, SPELLER_HEADER)
+        for records in _read_chunks(source, chunk_size=chunk_size, usecols=(0, 1, 2, 3)):
+            timestamps: np.ndarray = (records[:, 0].astype(np.float64) * 1_000_000).astype(np.int64)
+            _write_chunk(target, [timestamps.astype(str), records[:, 1:]])
+
+    _rewrite(log_file, correct)
+    return True
+
+
+CORRECTIONS: dict[str, Callable[[str, int], bool]] = {
+    'emotiv': correct_emotiv_log,
+    'speller': correct_speller_log,
+}
+
+
+def correct_logs(log_files: list[str], kind: str, workers: int = 1, chunk_size: int = CHUNK_SIZE) \
+        -> list[tuple[str, bool]]:
+    """Corrects the logs of the given kind ('emotiv' or 'speller'), returns (file, corrected) pairs"""
+    correct: Callable[[str, int], bool] = CORRECTIONS[kind]
+    if workers <= 1:
+        return [(log_file, correct(log_file, chunk_size)) for log_file in log_files]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(zip(log_files, executor.map(correct, log_files, itertools.repeat(chunk_size))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Corrects raw emotiv or speller logs in place')
+    parser.add_argument('kind', choices=sorted(CORRECTIONS))
+    parser.add_argument('log_files', nargs='+')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='rows read and written at a time')
+    args = parser.parse_args()
+
+    for log_file, corrected in correct_logs(args.log_files, kind=args.kind, workers=args.workers,
+                                            chunk_size=args.chunk_size):
+        print(f'{log_file}: {"corrected" if corrected else "already corrected, skipped"}')
@@ -2,37 +2,18 @@
 Corrects timestamp format in speller logs, 
 written before the #e8df74 commit
 (decimal -> int without last digit)
+
+Kept for the existing call sites, the correction itself is in correct_logs.py
 """
 
 
-import csv
+import os
+
+from correct_logs import correct_logs, correct_speller_log
 
 
 def correct_log(log_file: str):
-    corrected_log = []
-    with open(log_file, newline='') as speller_log:
-        speller_log_reader = csv.reader(speller_log, delimiter=',')
-        header = next(speller_log_reader)
-        if header[0] != 'timestamp' or header[1] != 'row' or header[2] != 'col' or header[3] != 'correct':
-            raise ValueError(
-                '''The file with the gaze tracker log has wrong data formant. 
-                It must have a header with "timestamp", "row", "col" and "correct", 
-                separated by commas'''
-            )
-        corrected_log = [
-            (
-                int(float(record[0]) * 1_000_000),
-                record[1],
-                record[2],
-                record[3],
-            ) for record in speller_log_reader
-        ]
-    
-    with open(log_file, mode='w', newline='') as corrected_log_file:
-        writer = csv.writer(corrected_log_file)
-        writer.writerow(["timestamp", "row", "col", "correct"])
-        for record in corrected_log:
-            writer.writerow(record)
+    correct_speller_log(log_file)
 
 
 if __name__ == "__main__":
@@ -57,5 +38,4 @@ if __name__ == "__main__":
         ('bci_v3/l3_17.csv', 'speller_v3/l3_17.csv'),
     ]
 
-    for pair in log_files:
-        correct_log(pair[1])
+    correct_logs([pair[1] for pair in log_files], kind='speller', workers=os.cpu_count() or 1)
@@ -3,6 +3,7 @@ import csv
 from keyboard.keyboard_highlight_manager import HighlightManager
 from keyboard.keyboard import VirtualKeyboard
 from keyboard.keyboard_logger import EventLogger
+from keyboard.stimulus_timing import StimulusTimingRecorder
 
 
 def main():
@@ -22,10 +23,13 @@ def main():
 
     keyboard = VirtualKeyboard(root, layout, target_word)
 
-    logger = EventLogger(pathname='new_log_file.csv')
+    logger = EventLogger(pathname='new_log_file.csv', buffered=True)
     logger.setup()
 
-    highlight_manager = HighlightManager(keyboard, logger, interval=1000, interval_between_symbols=5000, interval_highlight=100)
+    timing_recorder = StimulusTimingRecorder(pathname='new_log_file.timing.json')
+
+    highlight_manager = HighlightManager(keyboard, logger, interval=1000, interval_between_symbols=5000, interval_highlight=100,
+                                         timing_recorder=timing_recorder, scheduler='deadline')
 
     root.bind('<Return>', lambda event: highlight_manager.start(event=event, root=root))
 
@@ -0,0 +1,75 @@
+import sys
+
+import numpy as np
+import pytest
+
+from acquisition import Acquisition, FileReplaySource, RingBuffer
+from bci_data import NEIRY
+from log_merger.bci_log_builder import BciLogBuilder
+
+
+SAMPLES = 60_000
+STEP_US = 4000  # 250 Гц
+
+
+@pytest.fixture
+def bci_file(tmp_path):
+    """Лог Neiry, в котором все каналы записи i равны i - по окну видно, из каких записей оно собрано"""
+    path = tmp_path / 'neiry.csv'
+    indices = np.arange(SAMPLES)
+    rows = np.column_stack([1_000_000 + indices * STEP_US] + [indices] * len(NEIRY.channels))
+    with open(path, 'w', newline='') as fp:
+        fp.write(','.join(['timestamp', *NEIRY.channels]) + '\r\n')
+        np.savetxt(fp, rows, delimiter=',', fmt='%d', newline='\r\n')
+    return str(path)
+
+
+def test_concurrent_reader_sees_consistent_epochs(bci_file):
+    source = FileReplaySource(bci_file=bci_file, bci_log_builder=BciLogBuilder(device=NEIRY), chunk_size=7,
+                              realtime=False, restamp=False)
+    timestamps = source.bci_log.timestamps
+    acquisition = Acquisition(source=source, sampling_rate=250, history_seconds=2)
+    shift_us, length = 200_000, 50
+    rng = np.random.default_rng(0)
+    checked = 0
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # чаще переключаем потоки, чтобы поиск пересекался с записью
+    try:
+        acquisition.start()
+        while not acquisition.finished.is_set():
+            latest = acquisition.latest_timestamp()
+            if latest is None:
+                continue
+            # Стимул не старше половины истории: окно не успеет затереться, пока его копируют
+            timestamp = latest - int(rng.integers(0, acquisition.buffer.capacity // 2)) * STEP_US - 1
+            try:
+                epoch = acquisition.get_epoch(timestamp=timestamp, shift_us=shift_us, length=length)
+            except ValueError as error:
+                # Писатель без задержек мог обогнать стимул больше чем на историю буфера
+                assert 'older than the history' in str(error)
+                continue
+            if epoch is None:
+                continue
+            epoch = np.array(epoch)
+            start = np.searchsorted(timestamps, timestamps[np.searchsorted(timestamps, timestamp)] + shift_us)
+            assert np.array_equal(epoch, np.repeat(np.arange(start, start + length)[:, np.newaxis],
+                                                   len(NEIRY.channels), axis=1))
+            checked += 1
+    finally:
+        sys.setswitchinterval(switch_interval)
+        acquisition.stop()
+
+    assert acquisition.buffer.written == SAMPLES
+    assert checked > 100
+
+
+def test_stimulus_older_than_history_is_rejected():
+    buffer = RingBuffer(capacity=64, n_channels=1, guard=4)
+    timestamps = np.arange(200, dtype=np.int64) * STEP_US
+    buffer.write(timestamps=timestamps, values=timestamps[:, np.newaxis].astype(np.float64))
+
+    assert buffer.oldest() == 200 - 64 + 2 * 4
+    assert buffer.get_epoch(timestamp=int(timestamps[150]), shift_us=0, length=10)[0, 0] == timestamps[150]
+    with pytest.raises(ValueError):
+        buffer.get_epoch(timestamp=int(timestamps[100]), shift_us=0, length=10)